@@ -8,16 +8,50 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from pathlib import Path
 import numpy as np
-from scipy import stats
+import argparse
+import json
 import os
+from calendar_dimension import add_date_keys, require_date_keys
+from customer_features import load_customer_features
+from deduplication import DERIVED_COLUMNS
+from sampling import SAMPLE_COLUMNS, load_stratified_sample, is_sampled, estimate_totals
+from sufficient_stats import GroupMoments, ContingencyCounts, RegressionMoments, one_way_anova, welch_ttest, chi_square
 
-def load_data():
-    """Load data from SQLite database"""
+# Above this many rows scatter/regression plots are binned instead of drawing every point
+LARGE_DATA_THRESHOLD = 100000
+
+def load_data(sample=None):
+    """Load data from SQLite database, or a stratified sample of it"""
     project_root = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     db_path = project_root / 'data' / 'db' / 'ecommerce.db'
     conn = sqlite3.connect(db_path)
+    # Customer metrics come from customer_features, which is keyed on date_key
+    require_date_keys(conn)
+    if sample:
+        return load_stratified_sample(conn, sample)
     return pd.read_sql('SELECT * FROM orders', conn)
 
+def load_customer_metrics():
+    """Per-customer order metrics from the incrementally maintained customer_features table"""
+    project_root = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    conn = sqlite3.connect(project_root / 'data' / 'db' / 'ecommerce.db')
+    features = load_customer_features(conn)
+    conn.close()
+    return features[['customer_id', 'total_spent', 'avg_order_value', 'order_count',
+                     'first_order_date', 'last_order_date']].set_index('customer_id')
+
+def sample_note(df):
+    """Title suffix marking results estimated from a sample"""
+    if not is_sampled(df):
+        return ''
+    return f"\n(estimated from {df.attrs.get('sample_fraction', 0):.1%} stratified sample, 95% CI)"
+
+def mark_sampled(results, df):
+    """Tag a results table computed from df with the sample it was estimated from"""
+    if not is_sampled(df):
+        return results
+    return results.assign(sampled=True, sample_fraction=df.attrs.get('sample_fraction', 0))
+
 def create_output_dirs():
     """Create output directories if they don't exist"""
     project_root = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -29,26 +63,60 @@ def save_plot(plt, filename, project_root):
     plt.savefig(project_root / 'data' / 'python_results' / filename)
     plt.close()
 
+def binned_regplot(df, x, y, bins=50):
+    """Draw a 2D histogram of x vs y with a regression line fitted from sufficient statistics
+    
+    Render cost depends only on the number of bins, not the number of rows.
+    """
+    data = df[[x, y]].dropna()
+    counts, x_edges, y_edges = np.histogram2d(data[x], data[y], bins=bins)
+    plt.pcolormesh(x_edges, y_edges, np.ma.masked_equal(counts.T, 0), cmap='Blues', shading='flat')
+    plt.colorbar(label='Orders')
+    
+    # Regression line with analytic 95% confidence band
+    moments = RegressionMoments.from_frame(data, x, y)
+    grid = np.linspace(x_edges[0], x_edges[-1], 100)
+    fitted, lower, upper = moments.confidence_band(grid)
+    plt.plot(grid, fitted, color='C3')
+    plt.fill_between(grid, lower, upper, color='C3', alpha=0.2)
+    return moments
+
 def analyze_sales_patterns(df, project_root):
     """Analyze and visualize sales patterns"""
     print("\nAnalyzing sales patterns...")
     
     # 1. Sales by Region with Statistical Tests
     plt.figure(figsize=(12, 6))
-    region_sales = df.groupby('region')['total_price'].agg(['sum', 'mean', 'count']).reset_index()
+    if is_sampled(df):
+        region_sales = estimate_totals(df, 'region', 'total_price').reset_index()
+    else:
+        region_sales = df.groupby('region')['total_price'].agg(['sum', 'mean', 'count']).reset_index()
     
-    # Perform ANOVA test
-    regions = df.groupby('region')['total_price'].apply(list)
-    f_stat, p_value = stats.f_oneway(*regions)
+    # Perform ANOVA test from per-region sufficient statistics
+    region_moments = GroupMoments.from_frame(df, 'region', 'total_price')
+    f_stat, p_value = one_way_anova(region_moments)
     
     sns.barplot(data=region_sales, x='region', y='sum')
-    plt.title(f'Sales by Region\nANOVA Test: p-value = {p_value:.4f}')
+    if is_sampled(df):
+        plt.errorbar(range(len(region_sales)), region_sales['sum'],
+                     yerr=region_sales['sum'] - region_sales['sum_ci_low'], fmt='none', color='black')
+    plt.title(f'Sales by Region\nANOVA Test: p-value = {p_value:.4f}{sample_note(df)}')
     plt.xlabel('Region')
     plt.ylabel('Total Sales')
     save_plot(plt, 'sales_by_region.png', project_root)
     
     # Save statistical summary
     stats_summary = region_sales.to_csv(project_root / 'data' / 'python_results' / 'region_sales_stats.csv')
+    
+    # 2. Significance tests on order value and category preference
+    tests = [{'test': 'One-way ANOVA (total_price by region)', 'statistic': f_stat, 'p_value': p_value}]
+    gender_moments = GroupMoments.from_frame(df, 'gender', 'total_price')
+    if {'Male', 'Female'} <= set(gender_moments.moments.index):
+        t_stat, t_p_value = welch_ttest(gender_moments, 'Male', 'Female')
+        tests.append({'test': "Welch's t-test (total_price, Male vs Female)", 'statistic': t_stat, 'p_value': t_p_value})
+    chi2, chi2_p_value, _ = chi_square(ContingencyCounts.from_frame(df, 'gender', 'category'))
+    tests.append({'test': 'Chi-square (gender x category)', 'statistic': chi2, 'p_value': chi2_p_value})
+    mark_sampled(pd.DataFrame(tests), df).to_csv(project_root / 'data' / 'python_results' / 'significance_tests.csv', index=False)
 
 def analyze_category_performance(df, project_root):
     """Analyze and visualize category performance"""
@@ -56,17 +124,23 @@ def analyze_category_performance(df, project_root):
     
     # 1. Category Revenue Analysis
     plt.figure(figsize=(12, 6))
-    category_sales = df.groupby('category').agg({
-        'total_price': ['sum', 'mean', 'count'],
-        'customer_id': 'nunique'
-    }).reset_index()
+    if is_sampled(df):
+        # Unique customers cannot be scaled up from a sample, so only totals are estimated
+        category_sales = estimate_totals(df, 'category', 'total_price').reset_index()
+        revenue = 'sum'
+    else:
+        category_sales = df.groupby('category').agg({
+            'total_price': ['sum', 'mean', 'count'],
+            'customer_id': 'nunique'
+        }).reset_index()
+        revenue = ('total_price', 'sum')
     
     # Calculate market share
-    category_sales['market_share'] = category_sales[('total_price', 'sum')] / category_sales[('total_price', 'sum')].sum() * 100
+    category_sales['market_share'] = category_sales[revenue] / category_sales[revenue].sum() * 100
     
     # Visualization
-    sns.barplot(data=category_sales, x='category', y=('total_price', 'sum'))
-    plt.title('Revenue by Category')
+    sns.barplot(data=category_sales, x='category', y=revenue)
+    plt.title(f'Revenue by Category{sample_note(df)}')
     plt.xlabel('Category')
     plt.ylabel('Total Revenue')
     plt.xticks(rotation=45)
@@ -81,48 +155,66 @@ def analyze_customer_behavior(df, project_root):
     
     # 1. Age-Purchase Correlation
     plt.figure(figsize=(10, 6))
-    sns.regplot(data=df, x='age', y='total_price')
-    correlation = df['age'].corr(df['total_price'])
-    plt.title(f'Age vs Purchase Amount\nCorrelation: {correlation:.2f}')
+    if len(df) > LARGE_DATA_THRESHOLD:
+        correlation = binned_regplot(df, 'age', 'total_price').correlation
+    else:
+        sns.regplot(data=df, x='age', y='total_price')
+        correlation = df['age'].corr(df['total_price'])
+    plt.title(f'Age vs Purchase Amount\nCorrelation: {correlation:.2f}{sample_note(df)}')
     plt.xlabel('Customer Age')
     plt.ylabel('Purchase Amount')
     save_plot(plt, 'age_purchase_correlation.png', project_root)
     
     # 2. Gender Category Analysis
     plt.figure(figsize=(12, 6))
-    gender_cat = df.groupby(['gender', 'category'])['total_price'].sum().unstack()
+    revenue = df['total_price'] * df['weight'] if is_sampled(df) else df['total_price']
+    gender_cat = revenue.groupby([df['gender'], df['category']]).sum().unstack()
     gender_cat.plot(kind='bar', stacked=True)
-    plt.title('Revenue by Gender and Category')
+    plt.title(f'Revenue by Gender and Category{sample_note(df)}')
     plt.xlabel('Gender')
     plt.ylabel('Total Revenue')
     plt.legend(title='Category', bbox_to_anchor=(1.05, 1))
     plt.tight_layout()
     save_plot(plt, 'gender_category_revenue.png', project_root)
     
+    # Per-customer metrics need every order of a customer, so they are not estimated from samples
+    if is_sampled(df):
+        print("Skipping customer metrics in sampled mode.")
+        return
+    
     # Save customer behavior metrics
-    customer_metrics = df.groupby('customer_id').agg({
-        'total_price': ['sum', 'mean', 'count'],
-        'order_date': ['min', 'max']
-    }).reset_index()
+    customer_metrics = load_customer_metrics().reset_index()
     customer_metrics.to_csv(project_root / 'data' / 'python_results' / 'customer_metrics.csv')
 
 def analyze_time_series(df, project_root):
     """Analyze and visualize time series patterns"""
     print("Analyzing time series patterns...")
     
-    # Convert order_date to datetime if not already
-    df['order_date'] = pd.to_datetime(df['order_date'])
+    # Integer date keys (YYYYMMDD) make the month a single integer division
+    if 'date_key' not in df.columns:
+        df = add_date_keys(df.copy())
+    dated = df[df['date_key'] > 0]
+    month_key = (dated['date_key'] // 100).rename('order_date')
     
     # Monthly sales trends
-    monthly_sales = df.groupby(df['order_date'].dt.to_period('M')).agg({
-        'total_price': ['sum', 'mean', 'count'],
-        'customer_id': 'nunique'
-    }).reset_index()
+    if is_sampled(df):
+        monthly_sales = estimate_totals(dated.assign(order_date=month_key), 'order_date', 'total_price')
+        revenue = 'sum'
+    else:
+        monthly_sales = dated.groupby(month_key).agg({
+            'total_price': ['sum', 'mean', 'count'],
+            'customer_id': 'nunique'
+        })
+        revenue = ('total_price', 'sum')
+    monthly_sales.index = [f"{m // 100}-{m % 100:02d}" for m in monthly_sales.index]
+    monthly_sales = monthly_sales.rename_axis('order_date').reset_index()
     
     # Plot trends
     plt.figure(figsize=(15, 6))
-    plt.plot(monthly_sales.index, monthly_sales[('total_price', 'sum')], marker='o')
-    plt.title('Monthly Sales Trend')
+    plt.plot(monthly_sales.index, monthly_sales[revenue], marker='o')
+    if is_sampled(df):
+        plt.fill_between(monthly_sales.index, monthly_sales['sum_ci_low'], monthly_sales['sum_ci_high'], alpha=0.2)
+    plt.title(f'Monthly Sales Trend{sample_note(df)}')
     plt.xlabel('Month')
     plt.ylabel('Total Sales')
     plt.xticks(rotation=45)
@@ -135,31 +227,50 @@ def generate_statistical_report(df, project_root):
     """Generate comprehensive statistical report"""
     print("Generating statistical report...")
     
+    # Describe the order attributes only, not hashes and keys derived from them
+    # or the sampling bookkeeping. In sampled mode these are unweighted sample
+    # statistics, so the saved tables are marked with the sample fraction.
+    data = df.drop(columns=DERIVED_COLUMNS + SAMPLE_COLUMNS, errors='ignore')
+    
     # Basic statistics
-    basic_stats = df.describe()
+    basic_stats = data.describe()
     
     # Correlation matrix
-    correlation_matrix = df.select_dtypes(include=[np.number]).corr()
-    
-    # Customer segments
-    customer_segments = df.groupby('customer_id').agg({
-        'total_price': ['sum', 'mean', 'count'],
-        'order_date': ['min', 'max']
-    })
+    correlation_matrix = data.select_dtypes(include=[np.number]).corr()
     
     # Save reports
-    basic_stats.to_csv(project_root / 'data' / 'python_results' / 'basic_statistics.csv')
-    correlation_matrix.to_csv(project_root / 'data' / 'python_results' / 'correlation_matrix.csv')
+    mark_sampled(basic_stats, df).to_csv(project_root / 'data' / 'python_results' / 'basic_statistics.csv')
+    mark_sampled(correlation_matrix, df).to_csv(project_root / 'data' / 'python_results' / 'correlation_matrix.csv')
+    
+    # Customer segments need full order histories
+    if is_sampled(df):
+        print("Skipping customer segments in sampled mode.")
+        return
+    customer_segments = load_customer_metrics()
     customer_segments.to_csv(project_root / 'data' / 'python_results' / 'customer_segments.csv')
 
-def main():
-    """Main analysis function"""
+def main(sample=None):
+    """Main analysis function
+    
+    With sample set to a fraction (e.g. 0.01) the analyses run on a
+    stratified sample and report scaled-up estimates with confidence intervals.
+    """
     print("Starting enhanced analysis...")
     
     # Load data
-    df = load_data()
+    df = load_data(sample)
     project_root = create_output_dirs()
     
+    # Record whether these results are exact or estimated
+    run_info = {'mode': 'full', 'rows_analyzed': len(df)}
+    if is_sampled(df):
+        run_info.update({'mode': 'sampled', 'sample_fraction': sample, 'strata': int(df['stratum_id'].nunique()),
+                         'estimated_total_rows': float(df['weight'].sum())})
+        print(f"\nSAMPLED RUN: analyzing {len(df)} orders from a {sample:.1%} stratified sample "
+              f"(region x category x month). Sums and counts are estimates with 95% confidence intervals.")
+    with open(project_root / 'data' / 'python_results' / 'run_info.json', 'w') as f:
+        json.dump(run_info, f, indent=4)
+    
     # Perform analyses
     analyze_sales_patterns(df, project_root)
     analyze_category_performance(df, project_root)
@@ -168,6 +279,12 @@ def main():
     generate_statistical_report(df, project_root)
     
     print("\nAnalysis complete! Check the data/python_results directory for outputs.")
+    if is_sampled(df):
+        print("Note: results were estimated from a stratified sample (see run_info.json).")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Exploratory analysis of the orders table')
+    parser.add_argument('--sample', type=float, metavar='FRACTION',
+                        help='analyze a stratified sample (e.g. 0.01) and report estimates with confidence intervals')
+    args = parser.parse_args()
+    main(args.sample) 
\ No newline at end of file
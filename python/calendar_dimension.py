@@ -0,0 +1,133 @@
+import pandas as pd
+import numpy as np
+from data_versions import bump_data_version
+
+# Formats order dates arrive in: ISO from the database, M/D/YYYY from the cleaned CSV
+DATE_FORMATS = ['%Y-%m-%d', '%m/%d/%Y', '%Y-%m-%d %H:%M:%S']
+
+# Fiscal year starts in July and is named after the calendar year it ends in
+FISCAL_YEAR_START_MONTH = 7
+
+def parse_order_dates(values):
+    """Parse order dates with explicit formats, converting each distinct string only once"""
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+
+    codes, uniques = pd.factorize(values)
+    uniques = pd.Series(uniques).astype(str)
+    parsed = pd.Series(pd.NaT, index=uniques.index, dtype='datetime64[ns]')
+    for fmt in DATE_FORMATS:
+        missing = parsed.isna()
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(uniques[missing], format=fmt, errors='coerce')
+
+    # Missing values have code -1, which picks the trailing NaT
+    lookup = np.append(parsed.to_numpy(), np.datetime64('NaT'))
+    return pd.Series(lookup[codes], index=values.index, name=values.name)
+
+def date_keys(dates):
+    """Integer YYYYMMDD date keys (0 for missing dates)"""
+    dates = pd.Series(dates)
+    keys = dates.dt.year * 10000 + dates.dt.month * 100 + dates.dt.day
+    return keys.fillna(0).astype('int64')
+
+def add_date_keys(df, column='order_date'):
+    """Add an integer date_key column and rewrite the date column as ISO text
+
+    Rows whose date cannot be parsed get date_key 0 and a missing date.
+    """
+    keys = date_keys(parse_order_dates(df[column]))
+    df['date_key'] = keys
+    df[column] = iso_dates(keys)
+    return df
+
+def key_periods(keys, freq='D'):
+    """Period ordinals for integer date keys, converting each distinct key once"""
+    codes, uniques = pd.factorize(pd.Series(keys))
+    dates = pd.to_datetime(pd.Series(uniques).astype(str), format='%Y%m%d')
+    return pd.PeriodIndex(dates, freq=freq).asi8[codes]
+
+def require_date_keys(conn, calendar=False):
+    """Raise a clear error if the database predates integer date keys (or lacks the calendar)
+
+    Databases written before date keys were added need the export (or
+    validate) stage to run once to add date_key and build the calendar.
+    """
+    columns = [col[1] for col in conn.execute("PRAGMA table_info(orders)")]
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if 'date_key' not in columns or (calendar and 'calendar' not in tables):
+        missing = 'date_key column' if 'date_key' not in columns else 'calendar table'
+        raise RuntimeError(f"orders database has no {missing}; run the export stage first "
+                           "(python python/pipeline.py export)")
+
+def iso_dates(keys):
+    """YYYY-MM-DD strings for integer date keys, formatting each distinct key once"""
+    keys = pd.Series(keys)
+    codes, uniques = pd.factorize(keys)
+    text = np.array([f"{k // 10000:04d}-{k // 100 % 100:02d}-{k % 100:02d}" if k > 0 else None
+                     for k in uniques] + [None], dtype=object)
+    return pd.Series(text[codes], index=keys.index)
+
+def build_calendar(start, end, fiscal_year_start_month=FISCAL_YEAR_START_MONTH):
+    """Calendar dimension with one row per day between start and end (inclusive)"""
+    dates = pd.Series(pd.date_range(pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize(), freq='D'))
+    iso = dates.dt.isocalendar()
+    month_names = np.array(['January', 'February', 'March', 'April', 'May', 'June', 'July',
+                            'August', 'September', 'October', 'November', 'December'])
+    day_names = np.array(['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'])
+
+    calendar = pd.DataFrame({
+        'date_key': date_keys(dates),
+        'date': dates.dt.strftime('%Y-%m-%d'),
+        'year': dates.dt.year,
+        'quarter': dates.dt.quarter,
+        'month': dates.dt.month,
+        'month_name': month_names[dates.dt.month - 1],
+        'day': dates.dt.day,
+        'day_of_week': dates.dt.dayofweek,
+        'day_name': day_names[dates.dt.dayofweek],
+        'iso_year': iso['year'].astype('int64'),
+        'iso_week': iso['week'].astype('int64'),
+    })
+
+    # Fiscal period 1 is the first month of the fiscal year
+    fiscal_period = (calendar['month'] - fiscal_year_start_month) % 12 + 1
+    calendar['fiscal_year'] = calendar['year']
+    if fiscal_year_start_month > 1:
+        calendar['fiscal_year'] += (calendar['month'] >= fiscal_year_start_month).astype(int)
+    calendar['fiscal_quarter'] = (fiscal_period - 1) // 3 + 1
+    calendar['fiscal_period'] = fiscal_period
+    return calendar
+
+def write_calendar(conn, keys):
+    """Create the calendar table covering the span of the given date keys
+
+    Without any valid date key (e.g. an empty orders table) the table is
+    created empty so joins against it still work.
+    """
+    keys = pd.to_numeric(pd.Series(keys), errors='coerce')
+    keys = keys[keys > 0].astype('int64')
+
+    cursor = conn.cursor()
+    cursor.execute("DROP TABLE IF EXISTS calendar")
+    cursor.execute("""
+        CREATE TABLE calendar (
+            date_key INTEGER PRIMARY KEY,
+            date TEXT, year INTEGER, quarter INTEGER, month INTEGER, month_name TEXT,
+            day INTEGER, day_of_week INTEGER, day_name TEXT, iso_year INTEGER, iso_week INTEGER,
+            fiscal_year INTEGER, fiscal_quarter INTEGER, fiscal_period INTEGER
+        )
+    """)
+    bump_data_version(conn, 'calendar')
+    if keys.empty:
+        conn.commit()
+        return pd.DataFrame()
+
+    start = pd.to_datetime(str(keys.min()), format='%Y%m%d')
+    end = pd.to_datetime(str(keys.max()), format='%Y%m%d')
+    calendar = build_calendar(start, end)
+    calendar.to_sql('calendar', conn, if_exists='append', index=False)
+    conn.commit()
+    return calendar
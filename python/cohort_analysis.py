@@ -0,0 +1,110 @@
+import pandas as pd
+import numpy as np
+import sqlite3
+from pathlib import Path
+import os
+from calendar_dimension import require_date_keys
+
+def build_cohort_matrices(customer_ids, date_keys, revenue):
+    """Build cohort x months-since-first-order retention and revenue matrices
+
+    Customers and months are mapped to integer codes so every aggregation is a
+    single np.bincount over a flattened (cohort, month offset) index instead of
+    a per-customer groupby.
+    """
+    customer_codes, _ = pd.factorize(pd.Series(customer_ids), sort=False)
+    # Month codes straight from integer YYYYMMDD keys
+    keys = np.asarray(date_keys, dtype=np.int64)
+    month_codes = keys // 10000 * 12 + keys // 100 % 100 - 1
+    revenue = np.asarray(revenue, dtype=np.float64)
+    n_customers = customer_codes.max() + 1
+
+    # First order month per customer
+    first_month = np.full(n_customers, np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(first_month, customer_codes, month_codes)
+
+    base_month = first_month.min()
+    customer_cohort = first_month - base_month
+    order_cohort = customer_cohort[customer_codes]
+    months_since_first = month_codes - first_month[customer_codes]
+
+    n_cohorts = customer_cohort.max() + 1
+    n_offsets = months_since_first.max() + 1
+    cell = order_cohort * n_offsets + months_since_first
+
+    # Revenue: every order contributes to its cell
+    revenue_matrix = np.bincount(cell, weights=revenue, minlength=n_cohorts * n_offsets)
+
+    # Active customers: count each (customer, month offset) pair once
+    active = np.unique(customer_codes.astype(np.int64) * n_offsets + months_since_first)
+    active_customers = active // n_offsets
+    active_cell = customer_cohort[active_customers] * n_offsets + active % n_offsets
+    customer_matrix = np.bincount(active_cell, minlength=n_cohorts * n_offsets)
+
+    customer_matrix = customer_matrix.reshape(n_cohorts, n_offsets)
+    revenue_matrix = revenue_matrix.reshape(n_cohorts, n_offsets)
+    cohort_sizes = np.bincount(customer_cohort, minlength=n_cohorts)
+
+    # Label cohorts by calendar month and keep only cohorts that acquired customers
+    first_period = pd.Period(year=int(base_month // 12), month=int(base_month % 12 + 1), freq='M')
+    cohort_labels = pd.period_range(first_period, periods=n_cohorts, freq='M').astype(str).rename('Cohort Month')
+    offsets = pd.Index(np.arange(n_offsets), name='Months Since First Order')
+    keep = cohort_sizes > 0
+
+    customers = pd.DataFrame(customer_matrix, index=cohort_labels, columns=offsets)[keep]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        retention = pd.DataFrame(customer_matrix / cohort_sizes[:, None], index=cohort_labels, columns=offsets)[keep]
+    revenue_df = pd.DataFrame(revenue_matrix, index=cohort_labels, columns=offsets)[keep]
+
+    return {
+        'cohort_sizes': pd.Series(cohort_sizes[keep], index=customers.index, name='Cohort Size'),
+        'active_customers': customers,
+        'retention_rate': retention,
+        'revenue': revenue_df
+    }
+
+def analyze_cohorts():
+    """Assign customers to first-order cohorts and export retention and revenue matrices"""
+    # Get project root path
+    project_root = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    output_dir = project_root / 'data' / 'customer_analysis'
+    output_dir.mkdir(parents=True, exist_ok=True)
+    powerbi_dir = project_root / 'powerbi' / 'data'
+    powerbi_dir.mkdir(parents=True, exist_ok=True)
+
+    # Connect to database and read only the columns the cohort engine needs
+    db_path = project_root / 'data' / 'db' / 'ecommerce.db'
+    conn = sqlite3.connect(db_path)
+    require_date_keys(conn)
+    print("Reading orders from database...")
+    df = pd.read_sql('SELECT customer_id, date_key, total_price FROM orders WHERE date_key > 0', conn)
+    conn.close()
+    df = df.dropna(subset=['customer_id'])
+
+    print("Building cohort matrices...")
+    cohorts = build_cohort_matrices(df['customer_id'], df['date_key'], df['total_price'].fillna(0))
+
+    # Save matrices
+    cohorts['active_customers'].to_csv(output_dir / 'cohort_active_customers.csv')
+    cohorts['retention_rate'].round(4).to_csv(output_dir / 'cohort_retention.csv')
+    cohorts['revenue'].round(2).to_csv(output_dir / 'cohort_revenue.csv')
+
+    # Long format for Power BI (one row per cohort and month offset)
+    dashboard = pd.concat({
+        'active_customers': cohorts['active_customers'].stack(),
+        'retention_rate': cohorts['retention_rate'].stack().round(4),
+        'revenue': cohorts['revenue'].stack().round(2)
+    }, axis=1).reset_index()
+    dashboard = dashboard.merge(cohorts['cohort_sizes'].reset_index(), on='Cohort Month')
+    dashboard.columns = dashboard.columns.str.lower().str.replace(' ', '_')
+    dashboard.to_csv(powerbi_dir / 'cohort_analysis.csv', index=False)
+
+    print(f"\nCohorts analyzed: {len(cohorts['cohort_sizes'])}")
+    print("\nRetention rate by cohort:")
+    print(cohorts['retention_rate'].round(2))
+    print(f"\nCohort analysis saved to {output_dir} and {powerbi_dir}")
+
+    return cohorts
+
+if __name__ == "__main__":
+    analyze_cohorts()
@@ -36,6 +36,16 @@ def create_powerbi_template():
                 "name": "Order Fulfillment",
                 "source": "order_fulfillment_analysis.csv",
                 "type": "CSV"
+            },
+            {
+                "name": "Cohort Retention",
+                "source": "cohort_analysis.csv",
+                "type": "CSV"
+            },
+            {
+                "name": "Series Forecasts",
+                "source": "series_forecasts.csv",
+                "type": "CSV"
             }
         ],
         "pages": [
@@ -56,6 +66,11 @@ def create_powerbi_template():
                         "type": "Line Chart",
                         "title": "Monthly Sales Trend",
                         "dataSource": "Sales by Region"
+                    },
+                    {
+                        "type": "Line Chart",
+                        "title": "Revenue Forecast by Region and Category",
+                        "dataSource": "Series Forecasts"
                     }
                 ]
             },
@@ -71,6 +86,11 @@ def create_powerbi_template():
                         "type": "Stacked Bar",
                         "title": "Product Preferences by Gender",
                         "dataSource": "Gender Analysis"
+                    },
+                    {
+                        "type": "Matrix",
+                        "title": "Cohort Retention by Months Since First Order",
+                        "dataSource": "Cohort Retention"
                     }
                 ]
             },
@@ -164,6 +184,7 @@ def create_powerbi_template():
    - Age vs purchase analysis
    - Gender-based preferences
    - Customer segments
+   - Cohort retention matrix
    
 3. Shipping & Fulfillment Page:
    - Regional shipping analysis
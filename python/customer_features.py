@@ -0,0 +1,247 @@
+import pandas as pd
+import numpy as np
+import sqlite3
+from pathlib import Path
+import argparse
+import os
+from calendar_dimension import require_date_keys
+from data_versions import bump_data_version
+
+# RFM quartile boundaries are recomputed once the order count has grown by this fraction
+RFM_REFRESH_GROWTH = 0.1
+
+# Score -> (boundary metric, SQL value, comparison counted against each boundary).
+# Scores run from 4 for the lowest quartile down to 1 for the highest. Recency is
+# scored on the Julian day of the last order against absolute cut-off days, so
+# scores do not drift as new orders move the latest order date.
+RFM_METRICS = {
+    'r_score': ('last_order_day', 'julianday(last_order_date)', '<'),
+    'f_score': ('orders_per_year', 'orders_per_year', '>'),
+    'm_score': ('total_spent', 'total_spent', '>'),
+}
+
+# Orders attributes counted per customer: modal gender and region, distinct active months
+COUNTED_FEATURES = {
+    'gender': 'gender',
+    'region': 'region',
+    'month': 'CASE WHEN date_key > 0 THEN CAST(date_key / 100 AS TEXT) END',
+}
+
+def create_feature_tables(conn):
+    """Create the customer feature tables if they don't exist"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS customer_features (
+            customer_id TEXT PRIMARY KEY,
+            order_count INTEGER, total_spent REAL, avg_order_value REAL,
+            first_order_date TEXT, last_order_date TEXT, lifetime_days INTEGER,
+            orders_per_year REAL, active_months INTEGER,
+            gender TEXT, region TEXT, age REAL,
+            r_score INTEGER, f_score INTEGER, m_score INTEGER, rfm_score TEXT
+        )
+    """)
+    # Running order counts per customer and attribute value, for modes and distinct counts
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS customer_feature_counts (
+            customer_id TEXT, feature TEXT, value TEXT, orders INTEGER,
+            PRIMARY KEY (customer_id, feature, value)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS customer_rfm_boundaries (
+            metric TEXT PRIMARY KEY, q1 REAL, q2 REAL, q3 REAL
+        )
+    """)
+    # Watermark (last orders rowid folded in) and RFM refresh bookkeeping
+    cursor.execute("CREATE TABLE IF NOT EXISTS customer_features_state (key TEXT PRIMARY KEY, value INTEGER)")
+    conn.commit()
+
+def _get_state(conn, key):
+    row = conn.execute("SELECT value FROM customer_features_state WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else 0
+
+def _set_state(conn, key, value):
+    conn.execute("INSERT OR REPLACE INTO customer_features_state (key, value) VALUES (?, ?)", (key, int(value)))
+
+def update_customer_features(conn, rebuild=False, refresh_rfm=False):
+    """Fold orders added since the last update into the customer_features table
+
+    Orders past the stored rowid watermark are aggregated per customer and
+    upserted into running totals; only customers with new orders get their
+    derived columns and RFM scores recomputed. RFM quartile boundaries are
+    refreshed (rescoring every customer) when refresh_rfm is set or the
+    order count has grown by RFM_REFRESH_GROWTH since the last refresh.
+    With rebuild=True the table is recomputed from the full order history.
+    When there is nothing to fold in the database is not written to, so
+    read paths can call this without touching the file.
+    """
+    require_date_keys(conn)
+    create_feature_tables(conn)
+    cursor = conn.cursor()
+
+    max_rowid = cursor.execute("SELECT COALESCE(MAX(rowid), 0) FROM orders").fetchone()[0]
+    last_rowid = _get_state(conn, 'last_rowid')
+    stored_boundaries = cursor.execute(
+        f"SELECT COUNT(*) FROM customer_rfm_boundaries WHERE metric IN ({', '.join('?' * len(RFM_METRICS))})",
+        [metric for metric, _, _ in RFM_METRICS.values()]).fetchone()[0]
+    if (not rebuild and not refresh_rfm and max_rowid == last_rowid
+            and (stored_boundaries == len(RFM_METRICS) or max_rowid == 0)):
+        return {'orders_processed': _get_state(conn, 'orders_processed'), 'customers_updated': 0,
+                'rfm_refreshed': False}
+
+    # A replaced orders table restarts rowids below the watermark
+    if rebuild or last_rowid > max_rowid:
+        rebuild = True
+        for table in ['customer_features', 'customer_feature_counts', 'customer_rfm_boundaries', 'customer_features_state']:
+            cursor.execute(f"DELETE FROM {table}")
+        last_rowid = 0
+
+    new_orders = "FROM orders WHERE rowid > ? AND rowid <= ? AND customer_id IS NOT NULL"
+    window = (last_rowid, max_rowid)
+
+    # Customers touched by the new orders
+    cursor.execute("DROP TABLE IF EXISTS temp.touched_customers")
+    cursor.execute(f"CREATE TEMP TABLE touched_customers AS SELECT DISTINCT customer_id {new_orders}", window)
+    touched = cursor.execute("SELECT COUNT(*) FROM touched_customers").fetchone()[0]
+
+    # Running aggregates
+    cursor.execute(f"""
+        INSERT INTO customer_features (customer_id, order_count, total_spent, first_order_date, last_order_date, age)
+        SELECT customer_id, COUNT(*), TOTAL(total_price), MIN(order_date), MAX(order_date), MIN(age)
+        {new_orders}
+        GROUP BY customer_id
+        ON CONFLICT (customer_id) DO UPDATE SET
+            order_count = order_count + excluded.order_count,
+            total_spent = total_spent + excluded.total_spent,
+            first_order_date = COALESCE(MIN(first_order_date, excluded.first_order_date), first_order_date, excluded.first_order_date),
+            last_order_date = COALESCE(MAX(last_order_date, excluded.last_order_date), last_order_date, excluded.last_order_date),
+            age = COALESCE(MIN(age, excluded.age), age, excluded.age)
+    """, window)
+    for feature, expression in COUNTED_FEATURES.items():
+        cursor.execute(f"""
+            INSERT INTO customer_feature_counts (customer_id, feature, value, orders)
+            SELECT customer_id, '{feature}', {expression}, COUNT(*)
+            {new_orders} AND {expression} IS NOT NULL
+            GROUP BY customer_id, 3
+            ON CONFLICT (customer_id, feature, value) DO UPDATE SET orders = orders + excluded.orders
+        """, window)
+
+    # Derived columns for touched customers only
+    cursor.execute("""
+        UPDATE customer_features SET
+            avg_order_value = total_spent / order_count,
+            lifetime_days = CAST(julianday(last_order_date) - julianday(first_order_date) AS INTEGER),
+            active_months = (SELECT COUNT(*) FROM customer_feature_counts c
+                             WHERE c.customer_id = customer_features.customer_id AND c.feature = 'month'),
+            gender = (SELECT value FROM customer_feature_counts c
+                      WHERE c.customer_id = customer_features.customer_id AND c.feature = 'gender'
+                      ORDER BY orders DESC, value LIMIT 1),
+            region = (SELECT value FROM customer_feature_counts c
+                      WHERE c.customer_id = customer_features.customer_id AND c.feature = 'region'
+                      ORDER BY orders DESC, value LIMIT 1)
+        WHERE customer_id IN (SELECT customer_id FROM touched_customers)
+    """)
+    cursor.execute("""
+        UPDATE customer_features SET
+            orders_per_year = CASE WHEN lifetime_days > 0 THEN order_count / (lifetime_days / 365.0) ELSE order_count END
+        WHERE customer_id IN (SELECT customer_id FROM touched_customers)
+    """)
+
+    orders_processed = _get_state(conn, 'orders_processed') + cursor.execute(
+        f"SELECT COUNT(*) {new_orders}", window).fetchone()[0]
+    _set_state(conn, 'last_rowid', max_rowid)
+    _set_state(conn, 'orders_processed', orders_processed)
+
+    orders_at_refresh = _get_state(conn, 'orders_at_rfm_refresh')
+    refresh_rfm = (refresh_rfm or rebuild or orders_at_refresh == 0 or stored_boundaries < len(RFM_METRICS)
+                   or orders_processed > orders_at_refresh * (1 + RFM_REFRESH_GROWTH))
+    if refresh_rfm:
+        refresh_rfm_boundaries(conn)
+        _set_state(conn, 'orders_at_rfm_refresh', orders_processed)
+    score_customers(conn, only_touched=not refresh_rfm)
+
+    cursor.execute("DROP TABLE temp.touched_customers")
+    bump_data_version(conn, 'customer_features')
+    conn.commit()
+    return {'orders_processed': orders_processed, 'customers_updated': touched, 'rfm_refreshed': refresh_rfm}
+
+def refresh_rfm_boundaries(conn):
+    """Recompute RFM quartile boundaries from the current customer features
+
+    Matches pd.qcut(q=4, duplicates='drop') on recency (days before the
+    latest order), orders per year and total spent: if any quartile edges
+    coincide the metric gets no boundaries and every customer scores 1.
+    Recency quartiles are stored as the Julian days they fall on, i.e.
+    recency > q exactly when last_order_day < latest day - q.
+    """
+    metrics = pd.read_sql("""
+        SELECT julianday(last_order_date) as last_order_day, orders_per_year, total_spent
+        FROM customer_features
+    """, conn)
+    latest_day = metrics['last_order_day'].max()
+    metrics['recency_days'] = latest_day - metrics['last_order_day']
+
+    boundaries = []
+    for metric, _, _ in RFM_METRICS.values():
+        values = metrics['recency_days' if metric == 'last_order_day' else metric].dropna()
+        edges = values.quantile([0, 0.25, 0.5, 0.75, 1]).to_numpy()
+        if len(values) == 0 or len(np.unique(edges)) < len(edges):
+            boundaries.append((metric, None, None, None))
+        elif metric == 'last_order_day':
+            boundaries.append((metric, *(float(latest_day - q) for q in edges[1:4])))
+        else:
+            boundaries.append((metric, *map(float, edges[1:4])))
+    conn.executemany("INSERT OR REPLACE INTO customer_rfm_boundaries (metric, q1, q2, q3) VALUES (?, ?, ?, ?)",
+                     boundaries)
+    return pd.DataFrame(boundaries, columns=['metric', 'q1', 'q2', 'q3'])
+
+def score_customers(conn, only_touched=False):
+    """Assign RFM scores from the stored quartile boundaries
+
+    With only_touched=True just the customers in temp.touched_customers
+    (set up by update_customer_features) are rescored.
+    """
+    assignments = []
+    params = []
+    for score, (metric, value, comparison) in RFM_METRICS.items():
+        # Quartile index 0-3 is the number of boundaries the value lies beyond
+        bounds = "(SELECT q1, q2, q3 FROM customer_rfm_boundaries WHERE metric = ?)"
+        assignments.append(f"""{score} = (
+            SELECT CASE WHEN b.q1 IS NULL THEN 1
+                        ELSE 4 - (({value} {comparison} b.q1) + ({value} {comparison} b.q2)
+                                  + ({value} {comparison} b.q3)) END
+            FROM {bounds} b)""")
+        params.append(metric)
+    where = "WHERE customer_id IN (SELECT customer_id FROM touched_customers)" if only_touched else ""
+    conn.execute(f"UPDATE customer_features SET {', '.join(assignments)} {where}", params)
+    conn.execute(f"""
+        UPDATE customer_features
+        SET rfm_score = CAST(r_score AS TEXT) || CAST(f_score AS TEXT) || CAST(m_score AS TEXT)
+        {where}
+    """)
+
+def load_customer_features(conn):
+    """Bring customer_features up to date with new orders and return it
+
+    recency_days is computed against the latest order date at read time;
+    r_score ranks the same way because it is scored on last_order_date.
+    """
+    update_customer_features(conn)
+    features = pd.read_sql("SELECT * FROM customer_features ORDER BY customer_id", conn)
+    last_order = pd.to_datetime(features['last_order_date'], format='%Y-%m-%d')
+    features.insert(features.columns.get_loc('last_order_date') + 1, 'recency_days',
+                    (last_order.max() - last_order).dt.days)
+    return features
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Update the customer_features table from new orders')
+    parser.add_argument('--rebuild', action='store_true', help='recompute from the full order history')
+    parser.add_argument('--refresh-rfm', action='store_true', help='recompute RFM quartile boundaries now')
+    args = parser.parse_args()
+
+    project_root = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    conn = sqlite3.connect(project_root / 'data' / 'db' / 'ecommerce.db')
+    summary = update_customer_features(conn, rebuild=args.rebuild, refresh_rfm=args.refresh_rfm)
+    print(f"Updated {summary['customers_updated']} customers from {summary['orders_processed']} orders "
+          f"(RFM boundaries {'refreshed' if summary['rfm_refreshed'] else 'unchanged'})")
+    conn.close()
@@ -1,31 +1,35 @@
 import pandas as pd
 import numpy as np
+import sqlite3
 from pathlib import Path
 import os
+from customer_features import load_customer_features
 
 def analyze_customer_frequencies():
-    # Read the Excel file
-    input_file = Path("data/e-commerce-sales-and-customer-insights-dataset.xlsx")
-    output_dir = Path("data/customer_analysis")
+    # Get project root path
+    project_root = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    
+    output_dir = project_root / 'data' / 'customer_analysis'
     output_dir.mkdir(parents=True, exist_ok=True)
     
-    print("Reading Excel file...")
-    # Read the data and print column names to verify
-    df = pd.read_excel(input_file)
-    print("\nColumns in Excel file:", df.columns.tolist())
+    # Connect to database
+    db_path = project_root / 'data' / 'db' / 'ecommerce.db'
+    conn = sqlite3.connect(db_path)
     
-    # Calculate orders per region from raw data (keeping all orders)
+    # Calculate orders per region (keeping all orders)
     print("\nAnalyzing orders per region...")
-    region_orders = df.groupby('Region').agg({
-        'Order Date': 'count',    # Total number of orders
-        'Total Price': 'sum',     # Total revenue
-        'Unit Price': 'mean',     # Average unit price
-        'Quantity': 'sum',        # Total quantity
-        'Customer ID': 'nunique'  # Unique customers
-    }).round(2)
-    
-    # Rename columns for clarity
-    region_orders.columns = ['Number of Orders', 'Total Revenue', 'Average Unit Price', 'Total Units Sold', 'Unique Customers']
+    region_orders = pd.read_sql("""
+        SELECT
+            region as Region,
+            COUNT(order_date) as "Number of Orders",
+            SUM(total_price) as "Total Revenue",
+            AVG(unit_price) as "Average Unit Price",
+            SUM(quantity) as "Total Units Sold",
+            COUNT(DISTINCT customer_id) as "Unique Customers"
+        FROM orders
+        WHERE region IS NOT NULL
+        GROUP BY region
+    """, conn, index_col='Region').round(2)
     
     # Calculate additional metrics
     region_orders['Average Order Value'] = (region_orders['Total Revenue'] / region_orders['Number of Orders']).round(2)
@@ -38,31 +42,25 @@ def analyze_customer_frequencies():
     # Save region analysis
     region_orders.to_csv(output_dir / "region_orders_analysis.csv")
     
-    # Convert date columns to datetime
-    df['Order Date'] = pd.to_datetime(df['Order Date'])
-    
     print("\nAnalyzing customer order patterns...")
-    # Calculate customer purchase frequencies (keeping all orders)
-    customer_freq = df.groupby('Customer ID').agg({
-        'Order Date': ['count', lambda x: (x.max() - x.min()).days],  # Count orders and lifetime
-        'Total Price': 'sum',  # Total spent
-    }).reset_index()
-    
-    # Rename the columns
-    customer_freq.columns = ['Customer ID', 'Total Orders', 'Customer Lifetime (days)', 'Total Price']
+    # Per-customer running aggregates, updated incrementally as orders land
+    features = load_customer_features(conn)
+    conn.close()
+    customer_freq = pd.DataFrame({
+        'Customer ID': features['customer_id'],
+        'Total Orders': features['order_count'],
+        'Customer Lifetime (days)': features['lifetime_days'],
+        'Total Price': features['total_spent']
+    })
     
     # Add average days between orders
-    customer_freq['Avg Days Between Orders'] = customer_freq.apply(
-        lambda x: x['Customer Lifetime (days)'] / (x['Total Orders'] - 1) if x['Total Orders'] > 1 else 0, 
-        axis=1
-    )
+    customer_freq['Avg Days Between Orders'] = (
+        customer_freq['Customer Lifetime (days)'] / (customer_freq['Total Orders'] - 1)
+    ).where(customer_freq['Total Orders'] > 1, 0)
     
     # Calculate additional metrics
-    customer_freq['Orders per Year'] = customer_freq.apply(
-        lambda x: x['Total Orders'] / (x['Customer Lifetime (days)'] / 365) if x['Customer Lifetime (days)'] > 0 else x['Total Orders'],
-        axis=1
-    )
-    customer_freq['Average Order Value'] = customer_freq['Total Price'] / customer_freq['Total Orders']
+    customer_freq['Orders per Year'] = features['orders_per_year']
+    customer_freq['Average Order Value'] = features['avg_order_value']
     
     # Print order frequency distribution
     print("\nOrder Frequency Distribution:")
@@ -81,47 +79,14 @@ def analyze_customer_frequencies():
         labels=['Single Purchase', 'Low Frequency', 'Medium Frequency', 'High Frequency']
     )
     
-    # Calculate recency
-    latest_date = df['Order Date'].max()
-    customer_recency = df.groupby('Customer ID')['Order Date'].max().reset_index()
-    customer_recency['Days Since Last Purchase'] = (latest_date - customer_recency['Order Date']).dt.days
-    
-    # Merge recency with frequency data
-    customer_freq = customer_freq.merge(
-        customer_recency[['Customer ID', 'Days Since Last Purchase']],
-        on='Customer ID'
-    )
+    # Recency and RFM segments (quartile boundaries are refreshed periodically in the feature table)
+    customer_freq['Days Since Last Purchase'] = features['recency_days']
+    customer_freq['RFM_Score'] = features['rfm_score']
     
-    # Add RFM segments
-    try:
-        r_score = pd.qcut(customer_freq['Days Since Last Purchase'], q=4, labels=['4', '3', '2', '1'], duplicates='drop')
-    except ValueError:
-        r_score = pd.Series(['1'] * len(customer_freq))  # Default score if we can't calculate quantiles
-        
-    try:
-        f_score = pd.qcut(customer_freq['Orders per Year'], q=4, labels=['4', '3', '2', '1'], duplicates='drop')
-    except ValueError:
-        f_score = pd.Series(['1'] * len(customer_freq))  # Default score if we can't calculate quantiles
-        
-    try:
-        m_score = pd.qcut(customer_freq['Total Price'], q=4, labels=['4', '3', '2', '1'], duplicates='drop')
-    except ValueError:
-        m_score = pd.Series(['1'] * len(customer_freq))  # Default score if we can't calculate quantiles
-        
-    # Convert categorical to string before combining
-    customer_freq['RFM_Score'] = (r_score.astype(str) + 
-                                 f_score.astype(str) + 
-                                 m_score.astype(str))
-    
-    # Add gender and region analysis
-    customer_demographics = df.groupby('Customer ID').agg({
-        'Gender': lambda x: x.mode()[0],  # Most common gender
-        'Region': lambda x: x.mode()[0],  # Most common region
-        'Age': 'first'  # Age (assuming it's constant per customer)
-    }).reset_index()
-    
-    # Merge demographics with frequency data
-    customer_freq = customer_freq.merge(customer_demographics, on='Customer ID')
+    # Add gender and region analysis (most common per customer)
+    customer_freq['Gender'] = features['gender']
+    customer_freq['Region'] = features['region']
+    customer_freq['Age'] = features['age']
     
     # Add age segments
     customer_freq['Age Segment'] = pd.cut(
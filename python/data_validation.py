@@ -4,6 +4,11 @@ from pathlib import Path
 import numpy as np
 from datetime import datetime
 import os
+from calendar_dimension import add_date_keys, write_calendar
+from data_versions import bump_data_version
+from deduplication import row_hashes
+from customer_features import update_customer_features
+from sampling import update_strata_counts
 
 def validate_data():
     """Validate and clean data for more accurate analysis"""
@@ -21,6 +26,12 @@ def validate_data():
     # Data validation and cleaning
     print("\nPerforming data validation and cleaning...")
     
+    # Remove duplicate orders (identical content) before they inflate totals
+    print("\nChecking for duplicate orders...")
+    duplicate_orders = pd.Series(row_hashes(df)).duplicated().to_numpy()
+    print(f"Duplicate orders found and removed: {duplicate_orders.sum()}")
+    df = df[~duplicate_orders].copy()
+    
     # 1. Handle missing values
     missing_values = df.isnull().sum()
     print("\nMissing values before cleaning:")
@@ -51,10 +62,10 @@ def validate_data():
     
     # 3. Validate date formats
     print("\nValidating dates...")
-    df['order_date'] = pd.to_datetime(df['order_date'], errors='coerce')
-    invalid_dates = df['order_date'].isnull().sum()
+    df = add_date_keys(df)
+    invalid_dates = (df['date_key'] == 0).sum()
     print(f"Invalid dates found and removed: {invalid_dates}")
-    df = df.dropna(subset=['order_date'])
+    df = df[df['date_key'] > 0].copy()
     
     # 4. Standardize categories
     print("\nStandardizing categories...")
@@ -80,16 +91,25 @@ def validate_data():
     # Save cleaned data back to database
     print("\nSaving cleaned data...")
     df.to_sql('orders', conn, if_exists='replace', index=False)
+    bump_data_version(conn, 'orders')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_date_key ON orders(date_key)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_strata ON orders(region, category, date_key)")
+    if 'row_hash' in df.columns:
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_row_hash ON orders(row_hash)")
+    write_calendar(conn, df['date_key'])
+    update_customer_features(conn, rebuild=True)
+    update_strata_counts(conn, rebuild=True)
     
     # Generate validation report
     report = {
         'total_records': len(df),
+        'duplicates_removed': int(duplicate_orders.sum()),
         'missing_values_after': df.isnull().sum().to_dict(),
         'unique_categories': df['category'].unique().tolist(),
         'unique_regions': df['region'].unique().tolist(),
         'date_range': {
-            'start': df['order_date'].min().strftime('%Y-%m-%d'),
-            'end': df['order_date'].max().strftime('%Y-%m-%d')
+            'start': df['order_date'].min(),
+            'end': df['order_date'].max()
         },
         'price_range': {
             'min': df['total_price'].min(),
@@ -0,0 +1,23 @@
+import uuid
+
+def create_versions_table(conn):
+    """Create the data_versions table of per-table version tokens if it doesn't exist"""
+    conn.execute("CREATE TABLE IF NOT EXISTS data_versions (table_name TEXT PRIMARY KEY, version TEXT)")
+
+def bump_data_version(conn, table):
+    """Record that table's contents changed
+
+    Writers call this in the transaction that changes the table. The version
+    is a fresh random token, so versions from a recreated database never
+    collide with ones cached from an earlier file.
+    """
+    create_versions_table(conn)
+    conn.execute("INSERT OR REPLACE INTO data_versions (table_name, version) VALUES (?, ?)",
+                 (table, uuid.uuid4().hex))
+
+def load_data_versions(conn):
+    """Current version token of every versioned table, as a dict"""
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'data_versions'").fetchone()
+    if not exists:
+        return {}
+    return dict(conn.execute("SELECT table_name, version FROM data_versions"))
@@ -0,0 +1,100 @@
+import pandas as pd
+import numpy as np
+
+# Columns that are derived during ingestion and not part of an order's content
+DERIVED_COLUMNS = ['row_hash', 'date_key']
+
+# SQLite limits the number of bound parameters per statement
+SQLITE_MAX_PARAMS = 900
+
+def row_hashes(df):
+    """64-bit content hash per row, stable across chunks and runs
+
+    Numeric columns are hashed as float64 so a column read as int in one
+    chunk and float in another still hashes identically.
+    """
+    content = df[[column for column in df.columns if column not in DERIVED_COLUMNS]].copy()
+    for column in content.columns:
+        if pd.api.types.is_numeric_dtype(content[column]):
+            content[column] = content[column].astype('float64')
+        else:
+            content[column] = content[column].astype(object).where(content[column].notna(), None)
+    # Stored as signed 64-bit so the hash fits an SQLite INTEGER column
+    return pd.util.hash_pandas_object(content, index=False).to_numpy().view(np.int64)
+
+class BloomFilter:
+    """Fixed-size Bloom filter over 64-bit row hashes
+
+    Memory is set by capacity and error rate, not by how many rows are
+    added. False positives are resolved against the SQLite hash index;
+    there are no false negatives, so a miss means the row is new.
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.n_bits = max(64, int(-capacity * np.log(error_rate) / np.log(2) ** 2))
+        self.n_hashes = max(1, int(round(self.n_bits / capacity * np.log(2))))
+        self.bits = np.zeros((self.n_bits + 7) // 8, dtype=np.uint8)
+
+    def _positions(self, hashes):
+        """Bit positions for each hash via double hashing (k x n array)"""
+        hashes = np.asarray(hashes, dtype=np.int64).view(np.uint64)
+        h1 = hashes & np.uint64(0xFFFFFFFF)
+        h2 = (hashes >> np.uint64(32)) | np.uint64(1)
+        k = np.arange(self.n_hashes, dtype=np.uint64)[:, None]
+        return (h1 + k * h2) % np.uint64(self.n_bits)
+
+    def add(self, hashes):
+        """Mark hashes as seen"""
+        positions = self._positions(hashes).ravel()
+        masks = np.left_shift(np.uint8(1), (positions & np.uint64(7)).astype(np.uint8))
+        np.bitwise_or.at(self.bits, positions >> np.uint64(3), masks)
+
+    def might_contain(self, hashes):
+        """Boolean array: False means definitely not seen, True means possibly seen"""
+        positions = self._positions(hashes)
+        set_bits = (self.bits[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1
+        return set_bits.all(axis=0)
+
+def existing_hashes(conn, hashes, table='orders'):
+    """Subset of hashes already present in the table's UNIQUE row_hash index"""
+    found = set()
+    hashes = [int(h) for h in hashes]
+    for start in range(0, len(hashes), SQLITE_MAX_PARAMS):
+        batch = hashes[start:start + SQLITE_MAX_PARAMS]
+        placeholders = ', '.join('?' * len(batch))
+        rows = conn.execute(f"SELECT row_hash FROM {table} WHERE row_hash IN ({placeholders})", batch)
+        found.update(row[0] for row in rows)
+    return found
+
+def load_bloom_filter(conn, capacity, table='orders', chunksize=1000000):
+    """Build a Bloom filter from the hashes already stored in the table"""
+    bloom = BloomFilter(capacity)
+    for chunk in pd.read_sql(f"SELECT row_hash FROM {table}", conn, chunksize=chunksize):
+        bloom.add(chunk['row_hash'].to_numpy())
+    return bloom
+
+def drop_duplicates(conn, chunk, bloom, table='orders'):
+    """Hash a chunk and drop rows seen earlier in the chunk or already stored
+
+    Only rows the Bloom filter flags as possibly seen are checked against
+    SQLite. Returns the new rows and the counts of dropped duplicates.
+    """
+    chunk = chunk.copy()
+    chunk['row_hash'] = row_hashes(chunk)
+
+    # Duplicates within this chunk
+    in_chunk = chunk['row_hash'].duplicated()
+    chunk = chunk[~in_chunk]
+
+    # Duplicates of rows from earlier chunks or runs
+    candidates = chunk['row_hash'][bloom.might_contain(chunk['row_hash'].to_numpy())]
+    stored = existing_hashes(conn, candidates, table) if len(candidates) else set()
+    already_stored = chunk['row_hash'].isin(stored)
+    chunk = chunk[~already_stored]
+
+    bloom.add(chunk['row_hash'].to_numpy())
+    return chunk, {
+        'duplicates_in_batch': int(in_chunk.sum()),
+        'duplicates_already_stored': int(already_stored.sum()),
+        'bloom_candidates_checked': int(len(candidates))
+    }
@@ -1,62 +1,143 @@
 import pandas as pd
 import sqlite3
 from pathlib import Path
+import argparse
+import json
 import os
+from calendar_dimension import add_date_keys, write_calendar
+from data_versions import bump_data_version
+from deduplication import BloomFilter, drop_duplicates, load_bloom_filter
+from customer_features import update_customer_features
+from sampling import update_strata_counts
 
-def create_database():
-    """Create SQLite database and export data from CSV"""
+# Rows read from the CSV per ingestion batch
+CHUNK_SIZE = 100000
+
+# Bloom filter sizing for a fresh database (grows with the existing table in append mode)
+BLOOM_CAPACITY = 10000000
+
+def create_database(csv_path=None, append=False):
+    """Create SQLite database and export data from CSV
+
+    Rows are streamed in chunks and deduplicated by content hash against the
+    UNIQUE row_hash index. With append=True new rows are added to the
+    existing orders table instead of replacing it, and only the customers
+    they touch are updated in customer_features.
+    """
     # Get the absolute path to the project root
     project_root = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    
+
     # Read the cleaned CSV file
     print("Reading cleaned CSV data...")
-    csv_path = project_root / 'data' / 'cleaned_data.csv'
+    csv_path = Path(csv_path) if csv_path else project_root / 'data' / 'cleaned_data.csv'
     print(f"Reading from: {csv_path}")
-    df = pd.read_csv(csv_path)
-    
-    # Standardize column names (convert to lowercase and replace spaces with underscores)
-    df.columns = df.columns.str.lower().str.replace(' ', '_')
-    print("\nStandardized column names:")
-    for old, new in zip(pd.read_csv(csv_path).columns, df.columns):
-        print(f"{old} -> {new}")
-    
+
     # Create database directory if it doesn't exist
     db_dir = project_root / 'data' / 'db'
     db_dir.mkdir(parents=True, exist_ok=True)
-    
+
     # Connect to SQLite database
     print("\nCreating SQLite database...")
     db_path = db_dir / 'ecommerce.db'
     print(f"Creating database at: {db_path}")
     conn = sqlite3.connect(db_path)
-    
+    cursor = conn.cursor()
+
+    if append:
+        columns = [col[1] for col in cursor.execute("PRAGMA table_info(orders)")]
+        if 'row_hash' not in columns:
+            raise RuntimeError("orders has no row_hash column; run a full export before appending")
+        existing = cursor.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+        print(f"Loading {existing} existing row hashes into Bloom filter...")
+        bloom = load_bloom_filter(conn, max(BLOOM_CAPACITY, 2 * existing))
+    else:
+        cursor.execute("DROP TABLE IF EXISTS orders")
+        bloom = BloomFilter(BLOOM_CAPACITY)
+
     # Export data to SQLite
     print("Exporting data to SQLite...")
-    df.to_sql('orders', conn, if_exists='replace', index=False)
-    
+    report = {'rows_read': 0, 'rows_inserted': 0, 'duplicates_in_batch': 0,
+              'duplicates_already_stored': 0, 'bloom_candidates_checked': 0}
+    for chunk in pd.read_csv(csv_path, chunksize=CHUNK_SIZE):
+        # Standardize column names (convert to lowercase and replace spaces with underscores)
+        original_columns = chunk.columns
+        chunk.columns = chunk.columns.str.lower().str.replace(' ', '_')
+        if report['rows_read'] == 0:
+            print("\nStandardized column names:")
+            for old, new in zip(original_columns, chunk.columns):
+                print(f"{old} -> {new}")
+
+        # Parse order dates once: ISO order_date text plus an integer date_key
+        chunk = add_date_keys(chunk)
+
+        # Drop rows already seen in this file or stored in the database
+        new_rows, counts = drop_duplicates(conn, chunk, bloom)
+        new_rows.to_sql('orders', conn, if_exists='append', index=False)
+        if report['rows_read'] == 0 and not append:
+            cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_row_hash ON orders(row_hash)")
+        conn.commit()
+
+        report['rows_read'] += len(chunk)
+        report['rows_inserted'] += len(new_rows)
+        for key, value in counts.items():
+            report[key] += value
+
+    if report['rows_inserted'] or not append:
+        bump_data_version(conn, 'orders')
+        conn.commit()
+
+    report['duplicates_dropped'] = report['duplicates_in_batch'] + report['duplicates_already_stored']
+    print(f"Rows read: {report['rows_read']}, inserted: {report['rows_inserted']}, "
+          f"duplicates dropped: {report['duplicates_dropped']} "
+          f"({report['duplicates_in_batch']} within the file, {report['duplicates_already_stored']} already stored)")
+
+    # Save deduplication report
+    report_path = project_root / 'data' / 'dedup_report.json'
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=4)
+
     # Verify the data
-    cursor = conn.cursor()
     cursor.execute("SELECT COUNT(*) FROM orders")
     count = cursor.fetchone()[0]
     print(f"Successfully exported {count} records to the database.")
-    
+
+    # Calendar dimension covering the span of the orders
+    stored_range = cursor.execute("SELECT MIN(date_key), MAX(date_key) FROM orders WHERE date_key > 0").fetchone()
+    calendar = write_calendar(conn, pd.Series(stored_range))
+    print(f"Created calendar table with {len(calendar)} days.")
+
+    # Customer features: rebuilt for a fresh table, updated for touched customers when appending
+    features = update_customer_features(conn, rebuild=not append)
+    print(f"Updated customer_features for {features['customers_updated']} customers.")
+
+    # Stratum sizes for sampled analysis runs
+    update_strata_counts(conn, rebuild=not append)
+
     # Display table schema
     cursor.execute("PRAGMA table_info(orders)")
     print("\nTable Schema:")
     for col in cursor.fetchall():
         print(f"Column: {col[1]}, Type: {col[2]}")
-    
+
     # Create indexes for better query performance
     print("\nCreating indexes...")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_row_hash ON orders(row_hash)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_region ON orders(region)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_category ON orders(category)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_gender ON orders(gender)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_shipping_status ON orders(shipping_status)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_order_date ON orders(order_date)")
-    
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_date_key ON orders(date_key)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_strata ON orders(region, category, date_key)")
+
     conn.commit()
     conn.close()
     print("Database creation complete!")
+    return report
 
 if __name__ == "__main__":
-    create_database() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Export order CSV data to SQLite with deduplication')
+    parser.add_argument('csv_path', nargs='?', help='CSV file to ingest (default: data/cleaned_data.csv)')
+    parser.add_argument('--append', action='store_true', help='add new orders to the existing table')
+    args = parser.parse_args()
+    create_database(args.csv_path, args.append)
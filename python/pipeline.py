@@ -0,0 +1,151 @@
+"""E-commerce Sales Analysis pipeline
+
+Runs one or more analysis stages in a single process:
+
+    python -m pipeline export sql analyze
+    python python/pipeline.py --timings validate frequency
+
+Stage modules (and with them pandas, matplotlib, seaborn and scipy) are only
+imported when a stage that needs them runs, so light stages such as
+`template` start fast and heavy imports are paid once per run.
+"""
+import argparse
+import importlib
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# Stage name -> (module, function, description), in pipeline order
+STAGES = {
+    'validate': ('data_validation', 'validate_data', 'Validate and clean the orders table'),
+    'export': ('export_to_db', 'create_database', 'Export cleaned CSV data to SQLite'),
+    'frequency': ('customer_frequency_analysis', 'analyze_customer_frequencies', 'Customer purchase frequency analysis'),
+    'cohort': ('cohort_analysis', 'analyze_cohorts', 'Cohort retention and revenue matrices'),
+    'affinity': ('product_affinity', 'analyze_product_affinity', 'Product co-purchase neighbor index'),
+    'sql': ('run_sql_analysis', 'main', 'Run SQL analysis queries'),
+    'analyze': ('analysis', 'main', 'Python exploratory analysis and plots'),
+    'forecast': ('prepare_forecast_data', 'prepare_forecast_data', 'Prepare time series data for Power BI'),
+    'forecast-series': ('forecasting', 'forecast_series', 'Forecast revenue per region x category'),
+    'template': ('create_powerbi_template', 'create_powerbi_template', 'Write the Power BI template configuration'),
+}
+
+# Width of the stage column in timing and import reports
+STAGE_WIDTH = max(len(name) for name in STAGES)
+
+# Default startup budget for `--import-budget`, in milliseconds
+DEFAULT_IMPORT_BUDGET_MS = 150
+
+# Stages that must start within the import budget (no pandas, matplotlib or scipy)
+LIGHT_STAGES = ['template']
+
+def run_stage(name, timings, **options):
+    """Import a stage module on first use and run it, recording import and run times"""
+    module_name, function_name, description = STAGES[name]
+    print(f"\n=== {name}: {description} ===")
+
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    imported = time.perf_counter()
+    getattr(module, function_name)(**options)
+    finished = time.perf_counter()
+
+    timings.append({
+        'stage': name,
+        'import_s': imported - start,
+        'run_s': finished - imported
+    })
+
+def measure_import_time(module_name):
+    """Cumulative import time of a module in a fresh interpreter, from `python -X importtime`"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module_name}'],
+        cwd=Path(__file__).resolve().parent,
+        capture_output=True,
+        text=True
+    )
+    # Lines look like: "import time:  self [us] | cumulative | imported package"
+    for line in reversed(result.stderr.splitlines()):
+        match = re.match(r'import time:\s+\d+\s+\|\s+(\d+)\s+\|\s*(\S+)$', line)
+        if match and match.group(2) == module_name:
+            return int(match.group(1)) / 1000
+    raise RuntimeError(f"Could not measure import time of {module_name}:\n{result.stderr[-2000:]}")
+
+def check_import_budget(stages, budget_ms):
+    """Report cold import times and check startup of the light stages against a budget
+
+    Each light stage's budget covers importing the pipeline plus the stage
+    module, so a heavy import added to one of them fails the check.
+    """
+    print("\nCold import times (python -X importtime):")
+    startup_ms = measure_import_time('pipeline')
+    print(f"  {'pipeline':<{STAGE_WIDTH}} {startup_ms:10.1f} ms")
+
+    within_budget = True
+    for name in LIGHT_STAGES:
+        module_name = STAGES[name][0]
+        total_ms = startup_ms + measure_import_time(module_name)
+        print(f"  {name:<{STAGE_WIDTH}} {total_ms:10.1f} ms  (pipeline + {module_name}, budget {budget_ms} ms)")
+        if total_ms > budget_ms:
+            print(f"Stage '{name}' startup exceeds import budget: {total_ms:.1f} ms > {budget_ms} ms")
+            within_budget = False
+
+    for name in stages:
+        if name in LIGHT_STAGES:
+            continue
+        module_name = STAGES[name][0]
+        print(f"  {name:<{STAGE_WIDTH}} {measure_import_time(module_name):10.1f} ms  ({module_name})")
+    return within_budget
+
+def print_timings(timings, total):
+    """Print per-stage import and run times"""
+    print("\nStage timings:")
+    print(f"  {'stage':<{STAGE_WIDTH}} {'import (s)':>10} {'run (s)':>10}")
+    for timing in timings:
+        print(f"  {timing['stage']:<{STAGE_WIDTH}} {timing['import_s']:10.2f} {timing['run_s']:10.2f}")
+    print(f"  {'total':<{STAGE_WIDTH}} {total:21.2f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='pipeline',
+        description='Run E-commerce Sales Analysis stages in one process.',
+        epilog='Stages: ' + ', '.join(f"{name} ({STAGES[name][2].lower()})" for name in STAGES)
+    )
+    parser.add_argument('stages', nargs='*', metavar='stage',
+                        help="stages to run in the given order, or 'all'")
+    parser.add_argument('--sql-backend', default='sqlite', choices=['sqlite', 'duckdb'],
+                        help='query engine for the sql stage (duckdb runs over Parquet snapshots)')
+    parser.add_argument('--sample', type=float, metavar='FRACTION',
+                        help='run the analyze stage on a stratified sample of orders')
+    parser.add_argument('--timings', action='store_true',
+                        help='report import and run time for each stage')
+    parser.add_argument('--import-budget', type=float, nargs='?', const=DEFAULT_IMPORT_BUDGET_MS, metavar='MS',
+                        help=f'measure cold import times with -X importtime and fail if pipeline '
+                             f'startup exceeds MS milliseconds (default {DEFAULT_IMPORT_BUDGET_MS})')
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.stages if name not in STAGES and name != 'all']
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)} (choose from {', '.join(STAGES)}, all)")
+
+    stages = list(STAGES) if 'all' in args.stages else args.stages
+    if not stages and args.import_budget is None:
+        parser.error('at least one stage is required')
+
+    if args.import_budget is not None:
+        if not check_import_budget(stages, args.import_budget):
+            return 1
+
+    timings = []
+    start = time.perf_counter()
+    stage_options = {'sql': {'backend': args.sql_backend}, 'analyze': {'sample': args.sample}}
+    for name in stages:
+        run_stage(name, timings, **stage_options.get(name, {}))
+
+    if args.timings and timings:
+        print_timings(timings, time.perf_counter() - start)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
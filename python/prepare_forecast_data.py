@@ -2,6 +2,7 @@ import pandas as pd
 import sqlite3
 from pathlib import Path
 import os
+from calendar_dimension import require_date_keys
 
 def prepare_forecast_data():
     """Prepare time series data for Power BI forecasting"""
@@ -11,38 +12,43 @@ def prepare_forecast_data():
     # Connect to database
     db_path = project_root / 'data' / 'db' / 'ecommerce.db'
     conn = sqlite3.connect(db_path)
+    require_date_keys(conn, calendar=True)
     
-    # Read data
+    # Aggregate by integer date key and join the calendar dimension, which
+    # supplies every day in the range (days without orders get 0) and the
+    # time intelligence columns
     query = """
+    WITH daily AS (
+        SELECT 
+            date_key,
+            COUNT(*) as total_orders,
+            SUM(total_price) as total_revenue,
+            SUM(quantity) as total_items,
+            AVG(total_price) as avg_order_value
+        FROM orders
+        WHERE date_key > 0
+        GROUP BY date_key
+    )
     SELECT 
-        DATE(order_date) as date,
-        COUNT(*) as total_orders,
-        SUM(total_price) as total_revenue,
-        SUM(quantity) as total_items,
-        AVG(total_price) as avg_order_value
-    FROM orders
-    GROUP BY DATE(order_date)
-    ORDER BY date
+        c.date,
+        COALESCE(d.total_orders, 0) as total_orders,
+        COALESCE(d.total_revenue, 0) as total_revenue,
+        COALESCE(d.total_items, 0) as total_items,
+        COALESCE(d.avg_order_value, 0) as avg_order_value,
+        c.year,
+        c.month,
+        c.day,
+        c.day_of_week,
+        c.month_name,
+        c.quarter
+    FROM calendar c
+    LEFT JOIN daily d ON d.date_key = c.date_key
+    WHERE c.date_key BETWEEN (SELECT MIN(date_key) FROM daily) AND (SELECT MAX(date_key) FROM daily)
+    ORDER BY c.date_key
     """
     
     df = pd.read_sql(query, conn)
     
-    # Ensure date is in correct format
-    df['date'] = pd.to_datetime(df['date'])
-    
-    # Fill any missing dates with 0
-    date_range = pd.date_range(start=df['date'].min(), end=df['date'].max())
-    df = df.set_index('date').reindex(date_range).fillna(0).reset_index()
-    df = df.rename(columns={'index': 'date'})
-    
-    # Add time intelligence columns
-    df['year'] = df['date'].dt.year
-    df['month'] = df['date'].dt.month
-    df['day'] = df['date'].dt.day
-    df['day_of_week'] = df['date'].dt.dayofweek
-    df['month_name'] = df['date'].dt.strftime('%B')
-    df['quarter'] = df['date'].dt.quarter
-    
     # Calculate 7-day moving average
     df['revenue_ma_7d'] = df['total_revenue'].rolling(window=7).mean()
     
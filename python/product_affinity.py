@@ -0,0 +1,123 @@
+import pandas as pd
+import numpy as np
+import sqlite3
+from scipy import sparse
+from pathlib import Path
+import os
+import time
+
+def build_customer_product_matrix(customer_ids, product_names):
+    """Build a binary customer x product CSR matrix (1 = customer bought the product)
+
+    Memory is proportional to the number of distinct (customer, product)
+    pairs, not customers x products.
+    """
+    customer_codes, customers = pd.factorize(pd.Series(customer_ids))
+    product_codes, products = pd.factorize(pd.Series(product_names))
+    matrix = sparse.csr_matrix(
+        (np.ones(len(customer_codes), dtype=np.float32), (customer_codes, product_codes)),
+        shape=(len(customers), len(products))
+    )
+    # Repeat purchases are summed by the constructor; keep only presence
+    matrix.data[:] = 1
+    return matrix, pd.Index(customers), pd.Index(products)
+
+def item_similarity(matrix):
+    """Item-item co-occurrence counts and cosine similarity from sparse matrix products"""
+    co_occurrence = (matrix.T @ matrix).tocsr()
+    co_occurrence.sort_indices()
+    buyers = co_occurrence.diagonal()
+    norms = np.sqrt(buyers)
+    with np.errstate(divide='ignore'):
+        inverse_norms = sparse.diags(np.where(norms > 0, 1 / norms, 0))
+    similarity = (inverse_norms @ co_occurrence @ inverse_norms).tocsr()
+    similarity.setdiag(0)
+    similarity.eliminate_zeros()
+    return co_occurrence, similarity
+
+def top_k_neighbors(co_occurrence, similarity, products, k=10):
+    """Top-k most similar products per product, as a long DataFrame"""
+    rows = []
+    for i in range(similarity.shape[0]):
+        start, end = similarity.indptr[i], similarity.indptr[i + 1]
+        if start == end:
+            continue
+        columns = similarity.indices[start:end]
+        scores = similarity.data[start:end]
+        if len(scores) > k:
+            keep = np.argpartition(-scores, k)[:k]
+            columns, scores = columns[keep], scores[keep]
+        # Co-purchase counts for the kept neighbors, looked up in the sorted CSR row
+        co_columns = co_occurrence.indices[co_occurrence.indptr[i]:co_occurrence.indptr[i + 1]]
+        co_counts = co_occurrence.data[co_occurrence.indptr[i]:co_occurrence.indptr[i + 1]]
+        counts = co_counts[np.searchsorted(co_columns, columns)]
+        order = np.argsort(-scores, kind='stable')
+        for rank, j in enumerate(order, start=1):
+            rows.append((products[i], rank, products[columns[j]], float(scores[j]), int(counts[j])))
+    return pd.DataFrame(rows, columns=['product_name', 'rank', 'neighbor', 'similarity', 'co_purchases'])
+
+class ProductNeighborIndex:
+    """In-memory lookup of persisted top-k neighbors ("customers who bought X also bought Y")"""
+
+    def __init__(self, neighbors):
+        self.neighbors = {
+            product: list(zip(group['neighbor'], group['similarity']))
+            for product, group in neighbors.sort_values(['product_name', 'rank']).groupby('product_name')
+        }
+
+    @classmethod
+    def from_db(cls, conn):
+        """Load the index from the product_neighbors table"""
+        return cls(pd.read_sql('SELECT * FROM product_neighbors', conn))
+
+    def similar(self, product_name, k=None):
+        """Most similar products to product_name as (neighbor, similarity) pairs"""
+        neighbors = self.neighbors.get(product_name, [])
+        return neighbors if k is None else neighbors[:k]
+
+def analyze_product_affinity(k=10):
+    """Build the item-item affinity index from orders and persist it"""
+    # Get project root path
+    project_root = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    output_dir = project_root / 'data' / 'python_results'
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    # Connect to database and read only the needed columns
+    db_path = project_root / 'data' / 'db' / 'ecommerce.db'
+    conn = sqlite3.connect(db_path)
+    print("Reading customer purchases from database...")
+    df = pd.read_sql('SELECT customer_id, product_name FROM orders', conn).dropna()
+
+    print("Building customer x product matrix...")
+    matrix, customers, products = build_customer_product_matrix(df['customer_id'], df['product_name'])
+    print(f"Customers: {matrix.shape[0]}, products: {matrix.shape[1]}, non-zeros: {matrix.nnz}")
+
+    co_occurrence, similarity = item_similarity(matrix)
+    neighbors = top_k_neighbors(co_occurrence, similarity, products, k)
+
+    # Persist the index
+    neighbors.to_csv(output_dir / 'product_neighbors.csv', index=False)
+    neighbors.to_sql('product_neighbors', conn, if_exists='replace', index=False)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_product_neighbors ON product_neighbors(product_name)")
+    conn.commit()
+
+    # Measure lookup latency on the persisted index
+    index = ProductNeighborIndex.from_db(conn)
+    conn.close()
+    lookups = list(products) * max(1, 10000 // len(products))
+    start = time.perf_counter()
+    for product in lookups:
+        index.similar(product, 5)
+    per_lookup_us = (time.perf_counter() - start) / len(lookups) * 1e6
+    print(f"Neighbor lookup: {per_lookup_us:.2f} µs per query")
+
+    print("\nCustomers who bought X also bought:")
+    for product in products:
+        also_bought = ', '.join(f"{name} ({score:.2f})" for name, score in index.similar(product, 3))
+        print(f"  {product}: {also_bought}")
+    print(f"\nProduct neighbor index saved to {output_dir / 'product_neighbors.csv'} and the product_neighbors table")
+
+    return index
+
+if __name__ == "__main__":
+    analyze_product_affinity()
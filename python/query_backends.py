@@ -0,0 +1,150 @@
+import pandas as pd
+import sqlite3
+import json
+import re
+import shutil
+from pathlib import Path
+from data_versions import load_data_versions
+
+# Tables copied into the columnar snapshot
+SNAPSHOT_TABLES = ['orders', 'calendar', 'customer_features']
+
+# Rows copied from SQLite into each Parquet part file of a snapshot
+SNAPSHOT_CHUNK_ROWS = 100000
+
+class SQLiteBackend:
+    """Run queries directly against the SQLite row store"""
+
+    name = 'sqlite'
+
+    def __init__(self, db_path):
+        self.conn = sqlite3.connect(db_path)
+
+    def execute(self, query):
+        """Execute a query and return the results as a DataFrame"""
+        cursor = self.conn.cursor()
+        cursor.execute(query)
+        columns = [description[0] for description in cursor.description]
+        return pd.DataFrame(cursor.fetchall(), columns=columns)
+
+    def close(self):
+        self.conn.close()
+
+class DuckDBBackend:
+    """Run queries on DuckDB over Parquet snapshots of the SQLite tables
+
+    Snapshots are written next to the database (data/db/parquet) together
+    with the data version of each table they were copied from, and a table
+    is only copied again when its version in data_versions has changed.
+    """
+
+    name = 'duckdb'
+
+    def __init__(self, db_path, snapshot_dir=None):
+        try:
+            import duckdb
+        except ImportError:
+            raise ImportError("The duckdb backend requires the duckdb package: pip install duckdb")
+
+        db_path = Path(db_path)
+        self.snapshot_dir = Path(snapshot_dir) if snapshot_dir else db_path.parent / 'parquet'
+        self.conn = duckdb.connect()
+        # SQLite sorts NULL as the smallest value; DuckDB defaults to NULLS LAST
+        self.conn.execute("SET default_null_order = 'nulls_first_on_asc_last_on_desc'")
+        self.snapshot(db_path)
+
+    def snapshot(self, db_path):
+        """Write Parquet snapshots of the SQLite tables if stale and expose them as views"""
+        self.snapshot_dir.mkdir(parents=True, exist_ok=True)
+        versions_path = self.snapshot_dir / 'versions.json'
+        snapshot_versions = json.loads(versions_path.read_text()) if versions_path.exists() else {}
+        source = sqlite3.connect(db_path)
+        existing = {row[0] for row in source.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        data_versions = load_data_versions(source)
+        for table in SNAPSHOT_TABLES:
+            if table not in existing:
+                continue
+            snapshot_path = self.snapshot_dir / table
+            # Tables without a recorded version are copied on every open
+            version = data_versions.get(table)
+            if version is None or snapshot_versions.get(table) != version or not snapshot_path.exists():
+                print(f"Writing Parquet snapshot: {snapshot_path}")
+                self.write_snapshot(source, table, snapshot_path)
+                snapshot_versions[table] = version
+            self.conn.execute(f"CREATE OR REPLACE VIEW {table} AS SELECT * FROM read_parquet('{snapshot_path.as_posix()}/*.parquet')")
+        source.close()
+        versions_path.write_text(json.dumps(snapshot_versions, indent=4))
+
+    def write_snapshot(self, source, table, snapshot_path):
+        """Copy a SQLite table into a directory of Parquet part files, SNAPSHOT_CHUNK_ROWS rows at a time
+
+        Columns are cast to the DuckDB type of their declared SQLite type so
+        every part file has the same schema. The parts are written to a
+        staging directory that replaces the old snapshot once complete.
+        """
+        columns = [(row[1], duckdb_type(row[2])) for row in source.execute(f"PRAGMA table_info({table})")]
+        staging_path = snapshot_path.with_name(f'{snapshot_path.name}.tmp')
+        shutil.rmtree(staging_path, ignore_errors=True)
+        staging_path.mkdir()
+        casts = ', '.join(f'CAST("{name}" AS {column_type}) AS "{name}"' for name, column_type in columns)
+        parts = 0
+        for chunk in pd.read_sql(f'SELECT * FROM {table}', source, chunksize=SNAPSHOT_CHUNK_ROWS):
+            self.conn.register('snapshot_chunk', chunk)
+            part_path = staging_path / f'part-{parts:05d}.parquet'
+            self.conn.execute(f"COPY (SELECT {casts} FROM snapshot_chunk) TO '{part_path.as_posix()}' (FORMAT PARQUET)")
+            self.conn.unregister('snapshot_chunk')
+            parts += 1
+        if parts == 0:
+            # Empty table: one empty part file carries the schema
+            empty = ', '.join(f'CAST(NULL AS {column_type}) AS "{name}"' for name, column_type in columns)
+            part_path = staging_path / 'part-00000.parquet'
+            self.conn.execute(f"COPY (SELECT {empty} LIMIT 0) TO '{part_path.as_posix()}' (FORMAT PARQUET)")
+        shutil.rmtree(snapshot_path, ignore_errors=True)
+        staging_path.rename(snapshot_path)
+
+    def execute(self, query):
+        """Translate a SQLite query to DuckDB, execute it and return a DataFrame"""
+        return self.conn.execute(translate_sqlite_to_duckdb(query)).df()
+
+    def close(self):
+        self.conn.close()
+
+def duckdb_type(sqlite_type):
+    """DuckDB column type for a declared SQLite column type
+
+    Integer and real affinities map to BIGINT and DOUBLE; text and anything
+    else (such as TIMESTAMP columns pandas writes as text) to VARCHAR.
+    """
+    sqlite_type = sqlite_type.upper()
+    if 'INT' in sqlite_type:
+        return 'BIGINT'
+    if any(name in sqlite_type for name in ('REAL', 'FLOA', 'DOUB')):
+        return 'DOUBLE'
+    return 'VARCHAR'
+
+def translate_sqlite_to_duckdb(query):
+    """Rewrite SQLite-only functions in a query into their DuckDB equivalents
+
+    - strftime('%fmt', expr) -> strftime(CAST(expr AS DATE), '%fmt')
+      (SQLite takes the format first and parses ISO text itself)
+    - DATE(expr) -> CAST(expr AS DATE)
+    """
+    query = re.sub(
+        r"strftime\(\s*('[^']*')\s*,\s*([^()]+?)\s*\)",
+        r"strftime(CAST(\2 AS DATE), \1)",
+        query,
+        flags=re.IGNORECASE
+    )
+    query = re.sub(r"\bDATE\(\s*([^()]+?)\s*\)", r"CAST(\1 AS DATE)", query, flags=re.IGNORECASE)
+    return query
+
+BACKENDS = {
+    'sqlite': SQLiteBackend,
+    'duckdb': DuckDBBackend,
+}
+
+def get_backend(name, db_path):
+    """Create a query backend by name"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend '{name}' (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[name](db_path)
@@ -1,17 +1,55 @@
 import sqlite3
 import pandas as pd
+import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 from pathlib import Path
+import argparse
 import os
+import re
+import shutil
+import time
+from query_backends import BACKENDS, get_backend
+from customer_features import update_customer_features
+from data_versions import bump_data_version
 
-def execute_query(cursor, query, title):
+def execute_query(backend, query, title):
     """Execute a SQL query and return results as a DataFrame"""
     print(f"\nExecuting: {title}")
-    cursor.execute(query)
-    columns = [description[0] for description in cursor.description]
-    results = cursor.fetchall()
-    return pd.DataFrame(results, columns=columns)
+    return backend.execute(query)
+
+def load_queries(sql_path):
+    """Split the SQL file into (title, query) pairs"""
+    with open(sql_path, 'r') as f:
+        sql_content = f.read()
+    
+    # Split SQL file into individual queries
+    # Split on semicolons but keep comments with their queries
+    queries = []
+    current_query = []
+    current_title = None
+    
+    for line in sql_content.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+            
+        if line.startswith('--'):
+            # If this is a numbered query comment, it's a new query title
+            if any(str(i) in line for i in range(10)):
+                if current_query:
+                    queries.append((current_title, '\n'.join(current_query)))
+                    current_query = []
+                current_title = line.lstrip('- ').strip()
+            continue
+            
+        current_query.append(line)
+    
+    # Add the last query
+    if current_query:
+        queries.append((current_title, '\n'.join(current_query)))
+    
+    return [(title, query) for title, query in queries if query.strip()]
 
 def save_results(df, title, output_dir):
     """Save query results as CSV and create a visualization"""
@@ -41,7 +79,118 @@ def save_results(df, title, output_dir):
     plt.close()
     print(f"Saved plot: {plot_file}")
 
-def main():
+def has_order_by(query):
+    """True if the query's outermost SELECT has an ORDER BY (ignoring subqueries and OVER clauses)"""
+    outer = query
+    while re.search(r'\([^()]*\)', outer):
+        outer = re.sub(r'\([^()]*\)', '', outer)
+    return re.search(r'\bORDER\s+BY\b', outer, flags=re.IGNORECASE) is not None
+
+def frames_match(left, right, ordered=False):
+    """Compare query results independent of backend dtypes
+
+    Results are compared row by row in the order returned when `ordered`
+    is set (the query has an ORDER BY); otherwise both are sorted first.
+    """
+    if list(left.columns) != list(right.columns) or len(left) != len(right):
+        return False
+    if not ordered:
+        left = left.sort_values(list(left.columns), na_position='last')
+        right = right.sort_values(list(right.columns), na_position='last')
+    left = left.reset_index(drop=True)
+    right = right.reset_index(drop=True)
+    for column in left.columns:
+        a, b = left[column], right[column]
+        if pd.api.types.is_numeric_dtype(a) and pd.api.types.is_numeric_dtype(b):
+            if not np.allclose(a.astype(float), b.astype(float), rtol=1e-9, equal_nan=True):
+                return False
+        elif not a.astype(object).where(a.notna(), None).equals(b.astype(object).where(b.notna(), None)):
+            return False
+    return True
+
+def check_parity(db_path, queries):
+    """Run every query on both backends and check the results are identical"""
+    backends = [get_backend(name, db_path) for name in BACKENDS]
+    all_match = True
+    print("\nChecking backend parity...")
+    for title, query in queries:
+        left, right = [backend.execute(query) for backend in backends]
+        match = frames_match(left, right, ordered=has_order_by(query))
+        all_match = all_match and match
+        print(f"  {'OK' if match else 'MISMATCH':<9} {title}")
+    for backend in backends:
+        backend.close()
+    return all_match
+
+def benchmark_backends(db_path, queries, rows=(1000, 100000, 1000000), repeats=3):
+    """Time each query on both backends over copies of orders scaled to the given row counts
+
+    Opening a backend is timed separately: for DuckDB it includes writing
+    the Parquet snapshot, which is paid again whenever the data changes.
+    """
+    bench_dir = Path(db_path).parent / 'benchmark'
+    bench_dir.mkdir(parents=True, exist_ok=True)
+    results = []
+    open_costs = []
+    try:
+        for target in rows:
+            # Scale orders up by repeated doubling, then trim to the target row count.
+            # Each size gets its own directory so snapshots are not shared.
+            bench_path = bench_dir / str(target) / 'ecommerce.db'
+            bench_path.parent.mkdir()
+            shutil.copyfile(db_path, bench_path)
+            conn = sqlite3.connect(bench_path)
+            # Doubled rows repeat their content hash
+            conn.execute("DROP INDEX IF EXISTS idx_row_hash")
+            while conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0] < target:
+                conn.execute("INSERT INTO orders SELECT * FROM orders")
+            conn.execute(f"DELETE FROM orders WHERE rowid > {target}")
+            bump_data_version(conn, 'orders')
+            conn.commit()
+            conn.execute("VACUUM")
+            conn.close()
+            
+            backends = []
+            open_cost = {'rows': target}
+            for name in BACKENDS:
+                start = time.perf_counter()
+                backends.append(get_backend(name, bench_path))
+                open_cost[name] = time.perf_counter() - start
+            open_costs.append(open_cost)
+            for title, query in queries:
+                timings = {}
+                for backend in backends:
+                    best = float('inf')
+                    for _ in range(repeats):
+                        start = time.perf_counter()
+                        backend.execute(query)
+                        best = min(best, time.perf_counter() - start)
+                    timings[backend.name] = best
+                results.append({'rows': target, 'query': title, **timings})
+            for backend in backends:
+                backend.close()
+    finally:
+        shutil.rmtree(bench_dir, ignore_errors=True)
+    
+    results = pd.DataFrame(results)
+    results['speedup'] = results['sqlite'] / results['duckdb']
+    results['winner'] = np.where(results['speedup'] > 1, 'duckdb', 'sqlite')
+    
+    print("\nBackend benchmark (best of {} runs, seconds):".format(repeats))
+    print(results.to_string(index=False, float_format=lambda x: f"{x:.4f}"))
+    print("\nQueries won by duckdb per table size:")
+    print(results.groupby('rows')['winner'].apply(lambda w: (w == 'duckdb').sum()).to_string())
+    
+    # Snapshot cost against the per-run saving of the whole query file
+    open_costs = pd.DataFrame(open_costs).set_index('rows')
+    query_totals = results.groupby('rows')[list(BACKENDS)].sum()
+    saving = query_totals['sqlite'] - query_totals['duckdb']
+    open_costs['runs_to_repay_snapshot'] = (open_costs['duckdb'] / saving).where(saving > 0)
+    print("\nBackend open cost (duckdb writes its Parquet snapshot), seconds:")
+    print(open_costs.to_string(float_format=lambda x: f"{x:.4f}"))
+    return results
+
+def main(backend='sqlite'):
     # Get the absolute path to the project root
     project_root = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     
@@ -51,50 +200,24 @@ def main():
     
     # Connect to database
     db_path = project_root / 'data' / 'db' / 'ecommerce.db'
-    print(f"Connecting to database: {db_path}")
+    print(f"Connecting to database: {db_path} ({backend} backend)")
+    
+    # Fold any newly landed orders into customer_features before querying it
     conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+    update_customer_features(conn)
+    conn.close()
+    engine = get_backend(backend, db_path)
     
     # Read SQL queries from file
     sql_path = project_root / 'sql' / 'SQL_Analysis_Queries.sql'
     print(f"Reading SQL queries from: {sql_path}")
-    with open(sql_path, 'r') as f:
-        sql_content = f.read()
-    
-    # Split SQL file into individual queries
-    # Split on semicolons but keep comments with their queries
-    queries = []
-    current_query = []
-    current_title = None
-    
-    for line in sql_content.split('\n'):
-        line = line.strip()
-        if not line:
-            continue
-            
-        if line.startswith('--'):
-            # If this is a numbered query comment, it's a new query title
-            if any(str(i) in line for i in range(10)):
-                if current_query:
-                    queries.append((current_title, '\n'.join(current_query)))
-                    current_query = []
-                current_title = line.lstrip('- ').strip()
-            continue
-            
-        current_query.append(line)
-    
-    # Add the last query
-    if current_query:
-        queries.append((current_title, '\n'.join(current_query)))
+    queries = load_queries(sql_path)
     
     # Process each query
     for title, query in queries:
-        if not query.strip():
-            continue
-            
         try:
             # Execute query and save results
-            df = execute_query(cursor, query, title)
+            df = execute_query(engine, query, title)
             save_results(df, title, output_dir)
             print(f"Results saved for: {title}")
             
@@ -106,8 +229,23 @@ def main():
         except Exception as e:
             print(f"Error executing query for {title}: {str(e)}")
     
-    conn.close()
+    engine.close()
     print("\nSQL analysis complete! Check the data/sql_results directory for output files.")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Run the SQL analysis queries')
+    parser.add_argument('--backend', default='sqlite', choices=list(BACKENDS))
+    parser.add_argument('--check-parity', action='store_true', help='check both backends return identical results')
+    parser.add_argument('--benchmark', action='store_true', help='time both backends on scaled copies of orders')
+    args = parser.parse_args()
+    
+    if args.check_parity or args.benchmark:
+        project_root = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        db_path = project_root / 'data' / 'db' / 'ecommerce.db'
+        queries = load_queries(project_root / 'sql' / 'SQL_Analysis_Queries.sql')
+        if args.check_parity and not check_parity(db_path, queries):
+            raise SystemExit(1)
+        if args.benchmark:
+            benchmark_backends(db_path, queries)
+    else:
+        main(args.backend) 
\ No newline at end of file
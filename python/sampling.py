@@ -0,0 +1,183 @@
+import pandas as pd
+import numpy as np
+from calendar_dimension import require_date_keys
+
+# Every non-empty stratum keeps at least this many rows so its variance can be estimated
+MIN_PER_STRATUM = 2
+
+# Normal critical value for 95% confidence intervals
+Z_95 = 1.96
+
+# Stratum key of an order; NULL region/category map to '' and a NULL date_key to month -1
+STRATUM_KEYS = "COALESCE(region, '') as region_key, COALESCE(category, '') as category_key, COALESCE(date_key / 100, -1) as month_key"
+
+# Bookkeeping columns load_stratified_sample adds to each sampled order
+SAMPLE_COLUMNS = ['month_key', 'stratum_size', 'stratum_id', 'weight']
+
+def create_strata_table(conn):
+    """Create the order_strata table of per-stratum row counts if it doesn't exist"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS order_strata (
+            region_key TEXT, category_key TEXT, month_key INTEGER, stratum_size INTEGER,
+            UNIQUE (region_key, category_key, month_key)
+        )
+    """)
+    # Last orders rowid folded into the counts
+    cursor.execute("CREATE TABLE IF NOT EXISTS order_strata_state (key TEXT PRIMARY KEY, value INTEGER)")
+    conn.commit()
+
+def update_strata_counts(conn, rebuild=False):
+    """Fold orders added since the last update into the order_strata counts
+
+    Only orders past the stored rowid watermark are grouped, so keeping the
+    stratum sizes current costs time proportional to the new orders. With
+    rebuild=True (or when orders was replaced) the counts are recomputed.
+    When there are no new orders the database is not written to.
+    """
+    require_date_keys(conn)
+    create_strata_table(conn)
+    cursor = conn.cursor()
+    max_rowid = cursor.execute("SELECT COALESCE(MAX(rowid), 0) FROM orders").fetchone()[0]
+    row = cursor.execute("SELECT value FROM order_strata_state WHERE key = 'last_rowid'").fetchone()
+    last_rowid = row[0] if row else 0
+    if not rebuild and max_rowid == last_rowid:
+        return
+    # A replaced orders table restarts rowids below the watermark
+    if rebuild or last_rowid > max_rowid:
+        cursor.execute("DELETE FROM order_strata")
+        last_rowid = 0
+
+    cursor.execute(f"""
+        INSERT INTO order_strata (region_key, category_key, month_key, stratum_size)
+        SELECT {STRATUM_KEYS}, COUNT(*)
+        FROM orders WHERE rowid > ? AND rowid <= ?
+        GROUP BY 1, 2, 3
+        ON CONFLICT (region_key, category_key, month_key) DO UPDATE SET
+            stratum_size = stratum_size + excluded.stratum_size
+    """, (last_rowid, max_rowid))
+    cursor.execute("INSERT OR REPLACE INTO order_strata_state (key, value) VALUES ('last_rowid', ?)", (max_rowid,))
+    conn.commit()
+
+def _stratum_rowids(conn, stratum, limit):
+    """Random rowids from one stratum, via the (region, category, date_key) index"""
+    conditions, params = [], []
+    for column, key in [('region', stratum['region_key']), ('category', stratum['category_key'])]:
+        if key == '':
+            conditions.append(f"({column} IS NULL OR {column} = '')")
+        else:
+            conditions.append(f"{column} = ?")
+            params.append(key)
+    if stratum['month_key'] == -1:
+        conditions.append("date_key IS NULL")
+    else:
+        conditions.append("date_key BETWEEN ? AND ?")
+        params += [int(stratum['month_key']) * 100, int(stratum['month_key']) * 100 + 99]
+    rows = conn.execute(f"SELECT rowid FROM orders WHERE {' AND '.join(conditions)} ORDER BY RANDOM() LIMIT ?",
+                        params + [int(limit)])
+    return [r[0] for r in rows]
+
+def load_stratified_sample(conn, fraction, min_per_stratum=MIN_PER_STRATUM, seed=None):
+    """Draw a stratified sample of orders without scanning the orders table
+
+    Stratum sizes come from the order_strata counts, which are kept current
+    at ingestion. Rowids are drawn uniformly at random and fetched by
+    primary key, so each order is kept with probability `fraction` and,
+    given how many rows landed in a stratum, those rows are a simple random
+    sample of it. Strata left with fewer than min_per_stratum rows are
+    redrawn exactly through the (region, category, date_key) index, which
+    touches only those strata. Each sampled row carries its stratum and a
+    weight N_h / n_h so sums and counts can be scaled back up.
+    """
+    update_strata_counts(conn)
+    strata = pd.read_sql("SELECT rowid as stratum_id, * FROM order_strata WHERE stratum_size > 0", conn)
+    max_rowid = conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM orders").fetchone()[0]
+
+    # Uniform draw over the rowid range; rowids freed by deletes are simply not found
+    rng = np.random.default_rng(seed)
+    n_draws = min(max_rowid, int(round(fraction * max_rowid)))
+    rowids = np.sort(rng.choice(max_rowid, size=n_draws, replace=False) + 1)
+
+    cursor = conn.cursor()
+    cursor.execute("DROP TABLE IF EXISTS temp.sample_rows")
+    cursor.execute("CREATE TEMP TABLE sample_rows (order_rowid INTEGER PRIMARY KEY)")
+    cursor.executemany("INSERT INTO sample_rows VALUES (?)", ((int(r),) for r in rowids))
+    # CROSS JOIN pins the join order so SQLite looks orders up by rowid instead of scanning it
+    drawn = pd.read_sql(f"""
+        SELECT r.order_rowid, {STRATUM_KEYS}
+        FROM sample_rows r CROSS JOIN orders o ON o.rowid = r.order_rowid
+    """, conn)
+
+    # Redraw strata left short by the uniform pass
+    keys = ['region_key', 'category_key', 'month_key']
+    counts = drawn.groupby(keys).size().rename('drawn')
+    strata = strata.join(counts, on=keys)
+    strata['drawn'] = strata['drawn'].fillna(0)
+    short = strata[strata['drawn'] < np.minimum(min_per_stratum, strata['stratum_size'])]
+    if len(short):
+        short_rows = drawn.merge(short[keys], on=keys)['order_rowid']
+        cursor.executemany("DELETE FROM sample_rows WHERE order_rowid = ?", ((int(r),) for r in short_rows))
+        for _, stratum in short.iterrows():
+            redrawn = _stratum_rowids(conn, stratum, min(min_per_stratum, stratum['stratum_size']))
+            cursor.executemany("INSERT INTO sample_rows VALUES (?)", ((r,) for r in redrawn))
+
+    df = pd.read_sql(f"""
+        SELECT o.*, s.month_key, s.stratum_size, s.rowid as stratum_id
+        FROM sample_rows r
+        CROSS JOIN orders o ON o.rowid = r.order_rowid
+        CROSS JOIN order_strata s
+          ON s.region_key = COALESCE(o.region, '')
+         AND s.category_key = COALESCE(o.category, '')
+         AND s.month_key = COALESCE(o.date_key / 100, -1)
+    """, conn)
+    cursor.execute("DROP TABLE temp.sample_rows")
+
+    # Post-stratification weight: stratum size over rows actually drawn
+    df['weight'] = df['stratum_size'] / df.groupby('stratum_id')['stratum_id'].transform('size')
+    df.attrs['sample_fraction'] = fraction
+    return df
+
+def is_sampled(df):
+    """True if df is a stratified sample produced by load_stratified_sample"""
+    return 'weight' in df.columns and 'stratum_id' in df.columns
+
+def estimate_totals(df, by, value_col):
+    """Estimated sum, count and mean of value_col per group, with 95% confidence intervals
+
+    Uses the stratified estimator of a domain total: the variance of the
+    group total is the sum over strata of N_h^2 (1 - n_h/N_h) s_h^2 / n_h,
+    where s_h^2 is the within-stratum variance of value * [row in group].
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    data = df[by + [value_col, 'stratum_id', 'stratum_size', 'weight']].dropna(subset=[value_col])
+    data = data.assign(count=1.0, value=data[value_col].astype(float))
+    data['value_sq'] = data['value'] ** 2
+    data['weighted_value'] = data['value'] * data['weight']
+
+    # Sample size per stratum (over all groups)
+    strata = data.groupby('stratum_id').agg(n=('count', 'size'), N=('stratum_size', 'first'))
+
+    # Per stratum and group: sums and sums of squares of value and of the indicator
+    cells = data.groupby(['stratum_id'] + by).agg(
+        value_sum=('value', 'sum'),
+        value_sq=('value_sq', 'sum'),
+        count_sum=('count', 'sum')
+    ).reset_index().join(strata, on='stratum_id')
+    finite_correction = cells['N'] ** 2 * (1 - cells['n'] / cells['N']) / cells['n']
+    denominator = (cells['n'] - 1).where(cells['n'] > 1)
+    value_var = ((cells['value_sq'] - cells['value_sum'] ** 2 / cells['n']) / denominator).fillna(0)
+    count_var = ((cells['count_sum'] - cells['count_sum'] ** 2 / cells['n']) / denominator).fillna(0)
+    cells['sum_var'] = finite_correction * value_var
+    cells['count_var'] = finite_correction * count_var
+    variances = cells.groupby(by)[['sum_var', 'count_var']].sum()
+
+    estimates = data.groupby(by).agg(sum=('weighted_value', 'sum'), count=('weight', 'sum'))
+    estimates = estimates.join(variances)
+    sum_se = np.sqrt(estimates.pop('sum_var'))
+    count_se = np.sqrt(estimates.pop('count_var'))
+    estimates['sum_ci_low'] = estimates['sum'] - Z_95 * sum_se
+    estimates['sum_ci_high'] = estimates['sum'] + Z_95 * sum_se
+    estimates['count_ci_low'] = estimates['count'] - Z_95 * count_se
+    estimates['count_ci_high'] = estimates['count'] + Z_95 * count_se
+    estimates['mean'] = estimates['sum'] / estimates['count']
+    return estimates[['sum', 'sum_ci_low', 'sum_ci_high', 'mean', 'count', 'count_ci_low', 'count_ci_high']]
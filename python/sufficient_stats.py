@@ -0,0 +1,239 @@
+import pandas as pd
+import numpy as np
+import sqlite3
+from pathlib import Path
+import os
+
+class GroupMoments:
+    """Per-group count, mean and sum of squared deviations
+
+    Chunks are folded in with Chan's parallel update, so moments built over
+    separate partitions can be merged without revisiting the rows and memory
+    stays proportional to the number of groups.
+    """
+
+    def __init__(self):
+        self.moments = pd.DataFrame(columns=['count', 'mean', 'm2'], dtype=float)
+
+    @classmethod
+    def from_frame(cls, df, group_col, value_col):
+        """Build moments from a DataFrame in one pass"""
+        moments = cls()
+        moments.update(df[group_col], df[value_col])
+        return moments
+
+    def update(self, groups, values):
+        """Fold a chunk of (group, value) pairs into the running moments"""
+        chunk = pd.DataFrame({'group': np.asarray(groups), 'value': np.asarray(values, dtype=float)})
+        chunk = chunk.dropna()
+        grouped = chunk.groupby('group')['value']
+        count = grouped.count().astype(float)
+        mean = grouped.mean()
+        m2 = grouped.var(ddof=0).fillna(0) * count
+        other = GroupMoments()
+        other.moments = pd.DataFrame({'count': count, 'mean': mean, 'm2': m2})
+        self.merge(other)
+        return self
+
+    def merge(self, other):
+        """Merge moments computed over another chunk or partition"""
+        left = self.moments.reindex(self.moments.index.union(other.moments.index)).fillna(0)
+        right = other.moments.reindex(left.index).fillna(0)
+        count = left['count'] + right['count']
+        delta = right['mean'] - left['mean']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = left['mean'] + delta * (right['count'] / count)
+            m2 = left['m2'] + right['m2'] + delta ** 2 * left['count'] * right['count'] / count
+        self.moments = pd.DataFrame({'count': count, 'mean': mean.fillna(0), 'm2': m2.fillna(0)})
+        return self
+
+    @property
+    def variance(self):
+        """Sample variance (ddof=1) per group"""
+        return self.moments['m2'] / (self.moments['count'] - 1)
+
+class ContingencyCounts:
+    """Mergeable contingency table of counts for two categorical columns"""
+
+    def __init__(self):
+        self.counts = pd.DataFrame(dtype=float)
+
+    @classmethod
+    def from_frame(cls, df, row_col, col_col):
+        """Build a contingency table from a DataFrame in one pass"""
+        table = cls()
+        table.update(df[row_col], df[col_col])
+        return table
+
+    def update(self, rows, cols):
+        """Fold a chunk of (row, column) category pairs into the table"""
+        chunk = pd.DataFrame({'row': np.asarray(rows), 'col': np.asarray(cols)}).dropna()
+        other = ContingencyCounts()
+        other.counts = chunk.groupby(['row', 'col']).size().unstack(fill_value=0).astype(float)
+        self.merge(other)
+        return self
+
+    def merge(self, other):
+        """Merge counts computed over another chunk or partition"""
+        self.counts = self.counts.add(other.counts, fill_value=0).fillna(0)
+        return self
+
+class RegressionMoments:
+    """Mergeable moments (n, means, co-moments) for a simple linear regression of y on x"""
+
+    def __init__(self):
+        self.n = 0.0
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self.sxx = 0.0
+        self.syy = 0.0
+        self.sxy = 0.0
+
+    @classmethod
+    def from_frame(cls, df, x_col, y_col):
+        """Build regression moments from a DataFrame in one pass"""
+        moments = cls()
+        moments.update(df[x_col], df[y_col])
+        return moments
+
+    def update(self, x, y):
+        """Fold a chunk of (x, y) pairs into the running moments"""
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        valid = ~(np.isnan(x) | np.isnan(y))
+        x, y = x[valid], y[valid]
+        if len(x) == 0:
+            return self
+        other = RegressionMoments()
+        other.n = float(len(x))
+        other.mean_x, other.mean_y = x.mean(), y.mean()
+        dx, dy = x - other.mean_x, y - other.mean_y
+        other.sxx, other.syy, other.sxy = (dx * dx).sum(), (dy * dy).sum(), (dx * dy).sum()
+        return self.merge(other)
+
+    def merge(self, other):
+        """Merge moments computed over another chunk or partition"""
+        n = self.n + other.n
+        if n == 0:
+            return self
+        dx = other.mean_x - self.mean_x
+        dy = other.mean_y - self.mean_y
+        weight = self.n * other.n / n
+        self.sxx += other.sxx + dx * dx * weight
+        self.syy += other.syy + dy * dy * weight
+        self.sxy += other.sxy + dx * dy * weight
+        self.mean_x += dx * other.n / n
+        self.mean_y += dy * other.n / n
+        self.n = n
+        return self
+
+    @property
+    def correlation(self):
+        """Pearson correlation between x and y"""
+        return self.sxy / np.sqrt(self.sxx * self.syy)
+
+    def fit(self):
+        """Least-squares fit; returns (slope, intercept)"""
+        slope = self.sxy / self.sxx
+        return slope, self.mean_y - slope * self.mean_x
+
+    def confidence_band(self, x, level=0.95):
+        """Fitted values and analytic confidence interval of the mean response at x"""
+        from scipy import special
+        x = np.asarray(x, dtype=float)
+        slope, intercept = self.fit()
+        residual_var = max(self.syy - slope * self.sxy, 0.0) / (self.n - 2)
+        se = np.sqrt(residual_var * (1 / self.n + (x - self.mean_x) ** 2 / self.sxx))
+        t_crit = special.stdtrit(self.n - 2, 0.5 + level / 2)
+        fitted = intercept + slope * x
+        return fitted, fitted - t_crit * se, fitted + t_crit * se
+
+def one_way_anova(moments):
+    """One-way ANOVA from group moments; returns (F statistic, p-value)"""
+    from scipy import special
+    m = moments.moments[moments.moments['count'] > 0]
+    n_total = m['count'].sum()
+    k = len(m)
+    grand_mean = (m['count'] * m['mean']).sum() / n_total
+    ss_between = (m['count'] * (m['mean'] - grand_mean) ** 2).sum()
+    ss_within = m['m2'].sum()
+    df_between = k - 1
+    df_within = n_total - k
+    f_stat = (ss_between / df_between) / (ss_within / df_within)
+    p_value = special.fdtrc(df_between, df_within, f_stat)
+    return f_stat, p_value
+
+def welch_ttest(moments, group_a, group_b):
+    """Welch's unequal-variance t-test between two groups; returns (t statistic, p-value)"""
+    from scipy import special
+    m = moments.moments
+    var = moments.variance
+    n_a, n_b = m.loc[group_a, 'count'], m.loc[group_b, 'count']
+    se_a, se_b = var[group_a] / n_a, var[group_b] / n_b
+    t_stat = (m.loc[group_a, 'mean'] - m.loc[group_b, 'mean']) / np.sqrt(se_a + se_b)
+    dof = (se_a + se_b) ** 2 / (se_a ** 2 / (n_a - 1) + se_b ** 2 / (n_b - 1))
+    p_value = 2 * special.stdtr(dof, -abs(t_stat))
+    return t_stat, p_value
+
+def chi_square(table):
+    """Pearson chi-square test of independence; returns (chi2, p-value, degrees of freedom)"""
+    from scipy import special
+    observed = table.counts.to_numpy()
+    expected = observed.sum(axis=1, keepdims=True) * observed.sum(axis=0, keepdims=True) / observed.sum()
+    chi2 = ((observed - expected) ** 2 / expected).sum()
+    dof = (observed.shape[0] - 1) * (observed.shape[1] - 1)
+    p_value = special.chdtrc(dof, chi2)
+    return chi2, p_value, dof
+
+def stream_order_statistics(conn, chunksize=100000):
+    """Accumulate region moments, gender moments and gender x category counts in one streaming pass"""
+    region_moments = GroupMoments()
+    gender_moments = GroupMoments()
+    gender_category = ContingencyCounts()
+    query = 'SELECT region, gender, category, total_price FROM orders'
+    for chunk in pd.read_sql(query, conn, chunksize=chunksize):
+        region_moments.update(chunk['region'], chunk['total_price'])
+        gender_moments.update(chunk['gender'], chunk['total_price'])
+        gender_category.update(chunk['gender'], chunk['category'])
+    return region_moments, gender_moments, gender_category
+
+def compare_with_scipy():
+    """Check the sufficient-statistics tests against scipy on the sample data"""
+    from scipy import stats
+
+    project_root = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    db_path = project_root / 'data' / 'db' / 'ecommerce.db'
+    conn = sqlite3.connect(db_path)
+    df = pd.read_sql('SELECT region, gender, category, total_price FROM orders', conn)
+    region_moments, gender_moments, gender_category = stream_order_statistics(conn, chunksize=250)
+    conn.close()
+
+    results = []
+
+    # One-way ANOVA across regions
+    groups = [g.dropna().to_numpy() for _, g in df.groupby('region')['total_price']]
+    results.append(('ANOVA (region)', one_way_anova(region_moments)[:2], stats.f_oneway(*groups)[:2]))
+
+    # Welch's t-test between genders
+    genders = sorted(gender_moments.moments.index)[:2]
+    a = df.loc[df['gender'] == genders[0], 'total_price'].dropna()
+    b = df.loc[df['gender'] == genders[1], 'total_price'].dropna()
+    results.append((f'Welch t-test ({genders[0]} vs {genders[1]})',
+                    welch_ttest(gender_moments, genders[0], genders[1]),
+                    stats.ttest_ind(a, b, equal_var=False)[:2]))
+
+    # Chi-square test of gender x category
+    observed = pd.crosstab(df['gender'], df['category'])
+    chi2, p_value, _, _ = stats.chi2_contingency(observed, correction=False)
+    results.append(('Chi-square (gender x category)', chi_square(gender_category)[:2], (chi2, p_value)))
+
+    print("Comparing sufficient-statistics tests with scipy...")
+    for name, ours, reference in results:
+        match = np.allclose(ours, reference, rtol=1e-9, atol=1e-12)
+        print(f"{name}: statistic={ours[0]:.6f} p-value={ours[1]:.6g} "
+              f"(scipy: {reference[0]:.6f}, {reference[1]:.6g}) {'OK' if match else 'MISMATCH'}")
+    return all(np.allclose(ours, reference, rtol=1e-9, atol=1e-12) for _, ours, reference in results)
+
+if __name__ == "__main__":
+    if not compare_with_scipy():
+        raise SystemExit(1)
@@ -8,28 +8,9 @@ echo Step 1: Installing Python dependencies...
 pip install pandas numpy openpyxl sqlite3 matplotlib seaborn scikit-learn
 
 echo.
-echo Step 2: Running data validation...
-python python/data_validation.py
-
-echo.
-echo Step 3: Running customer frequency analysis...
-python python/customer_frequency_analysis.py
-
-echo.
-echo Step 4: Exporting data to database...
-python python/export_to_db.py
-
-echo.
-echo Step 5: Running SQL analysis...
-python python/run_sql_analysis.py
-
-echo.
-echo Step 6: Running Python analysis...
-python python/analysis.py
-
-echo.
-echo Step 7: Preparing data for Power BI...
-python python/prepare_powerbi_data.py
+echo Step 2: Running analysis stages in one process...
+echo   validate, export, frequency, cohort, affinity, sql, analyze, forecast, forecast-series, template
+python python/pipeline.py validate export frequency cohort affinity sql analyze forecast forecast-series template --timings
 
 echo.
 echo ===================================
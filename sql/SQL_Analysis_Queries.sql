@@ -13,7 +13,7 @@ SELECT
     COUNT(DISTINCT customer_id) as unique_customers
 FROM orders
 GROUP BY region
-ORDER BY total_sales DESC;
+ORDER BY total_sales DESC, region;
 
 -- 2. Product Category Revenue Analysis with Trends
 SELECT 
@@ -28,7 +28,7 @@ SELECT
 FROM orders
 WHERE category IS NOT NULL
 GROUP BY category
-ORDER BY total_revenue DESC;
+ORDER BY total_revenue DESC, category;
 
 -- 3. Shipping Analysis by Region with Cost Metrics
 SELECT 
@@ -42,7 +42,7 @@ SELECT
     ROUND(SUM(shipping_fee) * 100.0 / SUM(total_price), 2) as shipping_cost_ratio
 FROM orders
 GROUP BY region
-ORDER BY average_shipping_fee DESC;
+ORDER BY average_shipping_fee DESC, region;
 
 -- 4. Customer Age Impact Analysis with Detailed Metrics
 WITH age_groups AS (
@@ -69,7 +69,7 @@ SELECT
 FROM age_groups
 WHERE age_group IS NOT NULL
 GROUP BY age_group
-ORDER BY total_spent DESC;
+ORDER BY total_spent DESC, age_group;
 
 -- 5. Product Category Analysis by Gender with Market Share
 SELECT 
@@ -85,7 +85,7 @@ SELECT
 FROM orders
 WHERE gender IS NOT NULL AND category IS NOT NULL
 GROUP BY gender, category
-ORDER BY gender, total_revenue DESC;
+ORDER BY gender, total_revenue DESC, category;
 
 -- 6. Order Fulfillment Analysis with Time Metrics
 SELECT 
@@ -98,7 +98,7 @@ SELECT
     ROUND(AVG(shipping_fee), 2) as avg_shipping_fee
 FROM orders
 GROUP BY shipping_status
-ORDER BY total_orders DESC;
+ORDER BY total_orders DESC, shipping_status;
 
 -- 7. Monthly Sales Trends with Year-over-Year Growth
 WITH monthly_sales AS (
@@ -123,16 +123,16 @@ FROM monthly_sales
 ORDER BY month;
 
 -- 8. Customer Purchase Frequency Analysis
+-- Per-customer aggregates are maintained incrementally in customer_features
 WITH customer_frequency AS (
     SELECT 
         customer_id,
-        COUNT(*) as purchase_count,
-        SUM(total_price) as total_spent,
-        MIN(order_date) as first_purchase,
-        MAX(order_date) as last_purchase,
-        COUNT(DISTINCT strftime('%Y-%m', order_date)) as active_months
-    FROM orders
-    GROUP BY customer_id
+        order_count as purchase_count,
+        total_spent,
+        first_order_date as first_purchase,
+        last_order_date as last_purchase,
+        active_months
+    FROM customer_features
 )
 SELECT 
     CASE 
@@ -153,4 +153,4 @@ GROUP BY
         WHEN purchase_count <= 5 THEN 'Regular'
         ELSE 'Frequent'
     END
-ORDER BY avg_customer_value DESC; 
\ No newline at end of file
+ORDER BY avg_customer_value DESC, customer_type; 
\ No newline at end of file